@@ -0,0 +1,217 @@
+import os
+import time
+import asyncio
+import logging
+from starlette.responses import JSONResponse
+
+from backend.metrics import registry as metrics_registry
+
+# Largest request body accepted, checked against Content-Length and again while the body streams in
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "50"))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+# Seconds a request may wait for a free slot before it is turned away with 503
+ADMISSION_WAIT_SECONDS = float(os.getenv("ADMISSION_WAIT_SECONDS", "10"))
+# Retry-After of the 429 and 503 rejections
+ADMISSION_RETRY_AFTER_SECONDS = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "5"))
+
+
+class RouteLimit:
+    """
+    Concurrency limit of one group of routes with a bounded wait queue.
+
+    Up to max_concurrent requests run at once and up to max_waiting more wait for a slot;
+    anything beyond that is rejected straight away instead of piling up in memory.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_waiting: int):
+        self.name = name
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self._semaphore = None  # Created on first use, inside the server's event loop
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def _slots(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return self._semaphore
+
+    async def acquire(self, timeout: float) -> str:
+        """
+        Wait for a slot.
+
+        Returns:
+            str: None once a slot is held, or the rejection reason 'queue_full' or 'wait_timeout'.
+        """
+        slots = self._slots()
+        if not slots.locked():
+            await slots.acquire()  # Free slot: taken without suspending, so the counts below stay exact
+        elif self.waiting >= self.max_waiting:
+            self.rejected += 1
+            return "queue_full"
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(slots.acquire(), timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return "wait_timeout"
+            finally:
+                self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+        return None
+
+    def release(self) -> None:
+        self.active -= 1
+        self._slots().release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_waiting": self.max_waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+
+
+def _limit(name: str, concurrent: str, waiting: str) -> RouteLimit:
+    prefix = name.upper()
+    return RouteLimit(
+        name,
+        int(os.getenv(f"{prefix}_MAX_CONCURRENT", concurrent)),
+        int(os.getenv(f"{prefix}_MAX_WAITING", waiting)),
+    )
+
+
+# Local docling conversions hold a whole PDF in memory and a conversion process each
+PDF_LIMIT = _limit("pdf", "2", "4")
+# Enterprise PDFs wait on Adobe, so more of them can be in flight
+PDF_ENTERPRISE_LIMIT = _limit("pdf_enterprise", "8", "16")
+# Job submissions only spool the file to disk
+PDF_JOBS_LIMIT = _limit("pdf_jobs", "8", "16")
+SCRAPE_LIMIT = _limit("scrape", "8", "16")
+CRAWL_LIMIT = _limit("crawl", "2", "2")
+
+# Path -> limit; routes not listed here (health, metrics, job status) are never queued
+ROUTE_LIMITS = {
+    "/process-pdf/": PDF_LIMIT,
+    "/process-pdf/enterprise": PDF_ENTERPRISE_LIMIT,
+    "/jobs/pdf": PDF_JOBS_LIMIT,
+    "/scrape-web/": SCRAPE_LIMIT,
+    "/scrape-web/enterprise": SCRAPE_LIMIT,
+    "/crawl-web/": CRAWL_LIMIT,
+}
+
+
+class BodyTooLargeError(Exception):
+    """Raised to the application when the request body grows past MAX_UPLOAD_BYTES."""
+
+
+def rejection_response(status_code: int, message: str) -> JSONResponse:
+    """A JSON error telling the client when to come back; 413 has nothing to retry."""
+    headers = {} if status_code == 413 else {"Retry-After": str(ADMISSION_RETRY_AFTER_SECONDS)}
+    return JSONResponse(content={"error": message}, status_code=status_code, headers=headers)
+
+
+def _reject(limit_name: str, reason: str) -> None:
+    metrics_registry.inc("http_requests_rejected_total", (("route", limit_name), ("reason", reason)))
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying ROUTE_LIMITS and the upload size limit before a request reaches its route.
+
+    Requests over MAX_UPLOAD_BYTES get 413: immediately when Content-Length says so, otherwise as
+    soon as the streamed body crosses the limit, so an oversized upload is never read to the end.
+    A limited route with a full wait queue answers 429, and a request that waited
+    ADMISSION_WAIT_SECONDS without getting a slot answers 503, both with Retry-After.
+    The slot is held until the response, including a streamed one, is fully sent.
+    """
+
+    def __init__(self, app, route_limits: dict = None, max_body_bytes: int = MAX_UPLOAD_BYTES,
+                 wait_seconds: float = ADMISSION_WAIT_SECONDS):
+        self.app = app
+        self.route_limits = ROUTE_LIMITS if route_limits is None else route_limits
+        self.max_body_bytes = max_body_bytes
+        self.wait_seconds = wait_seconds
+        self.too_large_message = f"Request body exceeds {max_body_bytes / (1024 * 1024):g} MB"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.route_limits.get(scope["path"])
+        limit_name = limit.name if limit else "unlimited"
+
+        # Step 1: Refuse a declared oversized body before reading any of it
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_bytes:
+            _reject(limit_name, "too_large")
+            await rejection_response(413, self.too_large_message)(scope, receive, send)
+            return
+
+        # Step 2: Wait for a slot of the route, or turn the request away
+        if limit is not None:
+            started = time.perf_counter()
+            reason = await limit.acquire(self.wait_seconds)
+            if reason is not None:
+                _reject(limit_name, reason)
+                status_code = 429 if reason == "queue_full" else 503
+                message = f"Too many {limit.name} requests in progress, retry later"
+                await rejection_response(status_code, message)(scope, receive, send)
+                return
+            metrics_registry.observe("http_admission_wait_seconds", (("route", limit_name),), time.perf_counter() - started)
+
+        # Step 3: Run the route, cutting the body off once it crosses the limit
+        try:
+            await self._call_limited(scope, receive, send, limit_name)
+        finally:
+            if limit is not None:
+                limit.release()
+
+    async def _call_limited(self, scope, receive, send, limit_name: str) -> None:
+        received = 0
+        too_large = False
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received, too_large
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    too_large = True
+                    raise BodyTooLargeError(self.too_large_message)
+            return message
+
+        async def guarded_send(message):
+            nonlocal response_started
+            if too_large:
+                return  # The application's error response is replaced by the 413 below
+            response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except BodyTooLargeError:
+            pass
+        except Exception:
+            if not too_large:
+                raise
+        if too_large:
+            _reject(limit_name, "too_large")
+            if response_started:
+                logging.error(f"Request body to {scope['path']} exceeded the limit after the response started")
+                return
+            await rejection_response(413, self.too_large_message)(scope, receive, send)
+
+
+def admission_stats() -> dict:
+    """Return the state of every route limit for the health endpoint."""
+    return {limit.name: limit.stats() for limit in dict.fromkeys(ROUTE_LIMITS.values())}
@@ -1,17 +1,135 @@
+import time
+
+# Start of the startup report; the imports below count towards the time to readiness
+_STARTED = time.perf_counter()
+
 import os
-from fastapi import FastAPI, File, HTTPException, UploadFile
-from fastapi.responses import JSONResponse
+import sys
+import json
+import asyncio
+import logging
+import importlib
+import functools
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, HTTPException, Query, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
-from backend.pdf_extract import process_pdf
-from backend.web_scrape import scrape_and_convert
-from backend.web_scrape_enterprise import scrape_and_convert_enterprise
-from backend.pdf_extract_enterprise import process_pdf_enterprise
+from api.admission import AdmissionMiddleware, admission_stats
+from backend.converter_pool import DEFAULT_PROFILE, resolve_profile
+from backend.executors import (
+    QueueFullError, converter_health, cpu_executor, executor_stats, io_executor, run_cpu_bound, run_cpu_bound_sync,
+    run_io_bound, shutdown_pools, start_pools, warm_up_state
+)
+from backend.job_queue import JobQueue
+from backend.metrics import render_metrics
+from storage.result_cache import get_result_cache
+
+# Pipelines are imported on first use, so docling, the Adobe SDK, apify_client and markitdown
+# stay out of the cold start and each route pays only for its own dependencies
+BACKEND_MODULES = {
+    "scrape": "backend.web_scrape",
+    "scrape_enterprise": "backend.web_scrape_enterprise",
+    "crawl": "backend.web_crawl",
+    "pdf_enterprise": "backend.pdf_extract_enterprise",
+    "pdf": "backend.pdf_extract",
+}
+
+# Comma-separated backends imported in the background once the service accepts requests, e.g. 'scrape,pdf'
+PRELOAD_BACKENDS = [b.strip() for b in os.getenv("PRELOAD_BACKENDS", "").split(",") if b.strip()]
+
+# Maximum number of URLs of one /scrape-web/ request scraped at the same time
+SCRAPE_FAN_OUT = int(os.getenv("SCRAPE_FAN_OUT", "8"))
+
+# Comma-separated pipeline profiles whose docling models are loaded in the background after startup
+WARM_UP_PROFILES = [p.strip() for p in os.getenv("WARM_UP_PROFILES", DEFAULT_PROFILE).split(",") if p.strip()]
+
+startup_report = {"ready_seconds": None, "backend_import_seconds": {}, "preload": "off", "preload_errors": {}}
+
+
+def load_backend(name: str):
+    """
+    Import a pipeline module, recording how long its first import took.
+
+    Args:
+        name (str): A key of BACKEND_MODULES, e.g. 'pdf' or 'scrape_enterprise'.
+
+    Returns:
+        module: The imported backend module.
+    """
+    started = time.perf_counter()
+    module = importlib.import_module(BACKEND_MODULES[name])
+    startup_report["backend_import_seconds"].setdefault(name, round(time.perf_counter() - started, 3))
+    return module
+
+
+async def get_backend(name: str):
+    """Return a pipeline module, importing it off the event loop the first time."""
+    module = sys.modules.get(BACKEND_MODULES[name])
+    if module is not None and name in startup_report["backend_import_seconds"]:
+        return module
+    return await asyncio.get_running_loop().run_in_executor(None, load_backend, name)
+
+
+def preload() -> None:
+    """Import the PRELOAD_BACKENDS and warm the WARM_UP_PROFILES models while requests are served."""
+    startup_report["preload"] = "running"
+    for name in PRELOAD_BACKENDS:
+        try:
+            load_backend(name)
+        except Exception as e:
+            # A broken optional dependency only fails its own route
+            logging.error(f"Preloading backend '{name}' failed: {e}", exc_info=True)
+            startup_report["preload_errors"][name] = str(e)
+    if WARM_UP_PROFILES:
+        try:
+            start_pools(WARM_UP_PROFILES)
+        except Exception as e:
+            logging.error(f"Warming the converter pools failed: {e}", exc_info=True)
+            startup_report["preload_errors"]["converter_pools"] = str(e)
+    startup_report["preload"] = "done"
+
+
+def run_pdf_job(payload: bytes, progress_callback) -> dict:
+    """Convert a queued PDF in the conversion process pool, sharing its bound with /process-pdf/."""
+    pdf_extract = load_backend("pdf")
+    if cpu_executor is io_executor:
+        return pdf_extract.process_pdf(payload, progress_callback)
+    # The callback cannot cross into the worker process; the job reports one stage for the conversion
+    progress_callback("processing")
+    return run_cpu_bound_sync(pdf_extract.process_pdf, payload)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Background PDF jobs are queued in SQLite; conversions run in the same process pool as requests
+    app.state.job_queue = JobQueue({
+        "pdf": run_pdf_job,
+        "pdf_enterprise": lambda *args: load_backend("pdf_enterprise").process_pdf_enterprise(*args),
+    })
+    app.state.job_queue.start()
+
+    # Imports and model loading happen after the first requests are accepted, not before
+    if PRELOAD_BACKENDS or WARM_UP_PROFILES:
+        asyncio.get_running_loop().run_in_executor(None, preload)
 
+    startup_report["ready_seconds"] = round(time.perf_counter() - _STARTED, 3)
+    logging.getLogger("uvicorn.error").info(
+        f"Ready in {startup_report['ready_seconds']}s; "
+        f"preloading backends {PRELOAD_BACKENDS or 'none'} and profiles {WARM_UP_PROFILES or 'none'} in the background."
+    )
+    yield
+    app.state.job_queue.stop()
+    shutdown_pools()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
+
+# Per-route concurrency limits, bounded wait queues and the upload size limit; added before
+# CORS so that the 413/429/503 rejections still carry the CORS headers
+app.add_middleware(AdmissionMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,16 +142,156 @@ app.add_middleware(
 class URLInput(BaseModel):
     urls: List[str]
 
+class CrawlInput(BaseModel):
+    urls: List[str]                   # Seed pages
+    max_depth: Optional[int] = None   # Link hops from a seed; server default when omitted
+    max_pages: Optional[int] = None   # Pages crawled in total
+    url_prefix: Optional[str] = None  # Only follow links under this URL
+
+# Health Endpoint
+@app.get("/health")
+async def health_endpoint():
+    warm_up = warm_up_state() if WARM_UP_PROFILES else "ready"
+    adobe_client = sys.modules.get("backend.adobe_client")  # Not imported before the first enterprise PDF
+    return {
+        "status": {"ready": "ok", "failed": "failed"}.get(warm_up, "warming"),
+        "startup": startup_report,
+        "converter_pools": converter_health(),  # Per worker process when conversions run in the process pool
+        "executors": executor_stats(),
+        "admission": admission_stats(),
+        "adobe_jobs": adobe_client.adobe_stats() if adobe_client else None,
+        "jobs": app.state.job_queue.stats()
+    }
+
+
+# Result Cache Metrics Endpoint
+@app.get("/cache/stats")
+async def cache_stats_endpoint():
+    return {
+        namespace: get_result_cache(namespace).stats()
+        for namespace in ("pdf_opensource", "pdf_enterprise")
+    }
+
+
+# Prometheus Metrics Endpoint
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Stage latency histograms, bytes, image and error counters of all four pipelines
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+def queue_full_response(e: QueueFullError) -> JSONResponse:
+    """Tell the client to back off instead of queueing more work behind a saturated pool."""
+    return JSONResponse(content={"error": str(e)}, status_code=503, headers={"Retry-After": "5"})
+
+
+def scrape_result_fields(result: dict) -> dict:
+    """Select the fields returned to the client from a scraper result."""
+    if "error" in result:
+        return {"error": result["error"]}
+    # Collect result: Markdown and image S3 URLs
+    fields = {
+        "markdown_s3_url": result["markdown_s3_url"],
+        "image_s3_urls": result["image_s3_urls"],
+        "unique_folder": result["unique_folder"],
+        "status": result["status"],
+        "message": result["message"]
+    }
+    # Re-scrape details: whether the page changed, and the diff against the previous Markdown
+    for key in ("changed", "diff_s3_url"):
+        if key in result:
+            fields[key] = result[key]
+    return fields
+
+
+async def scrape_urls(scrape_func, urls: List[str]):
+    """
+    Scrape URLs concurrently with a bounded fan-out and yield each result as soon as it is ready.
+
+    Args:
+        scrape_func: A blocking scraper taking one URL, e.g. scrape_and_convert.
+        urls (List[str]): URLs to scrape.
+
+    Yields:
+        tuple: (url, result) in completion order; result holds the S3 URLs or an error message.
+    """
+    semaphore = asyncio.Semaphore(SCRAPE_FAN_OUT)
+
+    async def scrape_one(url: str) -> tuple:
+        async with semaphore:
+            try:
+                return url, scrape_result_fields(await run_io_bound(scrape_func, url))
+            except Exception as e:
+                return url, {"error": str(e)}
+
+    tasks = [asyncio.create_task(scrape_one(url)) for url in dict.fromkeys(urls)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        # Client went away: stop the URLs that have not started yet
+        for task in tasks:
+            task.cancel()
+
+
+async def scrape_urls_enterprise(urls: List[str], store_diff_file: bool = False):
+    """Crawl all URLs in one Apify actor run and yield (url, result) as each page is uploaded."""
+    remaining = dict.fromkeys(urls)
+    try:
+        web_scrape_enterprise = await get_backend("scrape_enterprise")
+        async for url, result in web_scrape_enterprise.iter_scrape_enterprise(urls, store_diff_file):
+            remaining.pop(url, None)
+            yield url, scrape_result_fields(result)
+    except Exception as e:
+        # The run could not be started or polled: every outstanding URL failed
+        for url in remaining:
+            yield url, {"error": str(e)}
+
+
+async def scrape_response(results, urls: Optional[List[str]], stream: bool):
+    """
+    Return all results as one JSON body, or stream them as NDJSON lines when stream is set.
+
+    The JSON body keeps the order of urls, or the completion order when urls is None (crawls).
+    """
+    if stream:
+        async def ndjson_lines():
+            async for url, result in results:
+                yield json.dumps({"url": url, **result}) + "\n"
+
+        return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+    markdown_results = {url: result async for url, result in results}
+    if urls is None:
+        return {"markdown_results": markdown_results}
+    # Keep the order of the request
+    return {"markdown_results": {url: markdown_results[url] for url in dict.fromkeys(urls)}}
+
 # PDF Extract and convert Endpoint  
 @app.post("/process-pdf/")
-async def process_pdf_endpoint(file: UploadFile = File(...)):
+async def process_pdf_endpoint(
+    file: UploadFile = File(...),
+    sharded: bool = Query(False),
+    profile: str = Query(DEFAULT_PROFILE, description="Pipeline profile: fast, standard or full"),
+    do_ocr: Optional[bool] = Query(None, description="Override the profile's OCR setting"),
+    images_scale: Optional[float] = Query(None, description="Override the profile's image scale")
+):
+    try:
+        profile_key = resolve_profile(profile, do_ocr, images_scale)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
     try:
         # Step 1: Read the uploaded file content
         file_content = await file.read()
 
-        # Step 2: Call the process_pdf function
-        result = process_pdf(file_content)
+        # Step 2: Run process_pdf in the conversion process pool; sharded runs fan out
+        # their page ranges to that pool from an I/O thread instead
+        pdf_extract = await get_backend("pdf")
+        if sharded:
+            result = await run_io_bound(pdf_extract.process_pdf, file_content, None, True, profile_key)
+        else:
+            result = await run_cpu_bound(pdf_extract.process_pdf, file_content, None, False, profile_key)
 
         # Step 3: Return the S3 URLs and other details
         return {
@@ -44,36 +302,54 @@ async def process_pdf_endpoint(file: UploadFile = File(...)):
             "status": result["status"]
         }
 
+    except QueueFullError as e:
+        return queue_full_response(e)
     except Exception as e:
         # Return a 500 error response in case of an exception
         return JSONResponse(content={"error": str(e)}, status_code=500)
     
 # Web Scraping Endpoint    
 @app.post("/scrape-web/")
-async def scrape_web_endpoint(data: URLInput):
-    markdown_results = {}
+async def scrape_web_endpoint(
+    data: URLInput,
+    stream: bool = Query(False),
+    diff: bool = Query(False, description="Upload a diff against the previous Markdown of changed pages")
+):
+    try:
+        # Scrape the URLs concurrently; stream=true returns one NDJSON line per finished URL
+        web_scrape = await get_backend("scrape")
+        scrape_func = functools.partial(web_scrape.scrape_and_convert, store_diff_file=diff)
+        return await scrape_response(scrape_urls(scrape_func, data.urls), data.urls, stream)
+
+    except Exception as e:
+        # Handle unexpected errors
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
 
+# Web Crawling Endpoint
+@app.post("/crawl-web/")
+async def crawl_web_endpoint(data: CrawlInput, stream: bool = Query(False)):
     try:
-        for url in data.urls:
-            try:
-                # Call the updated scrape_and_convert function
-                result = scrape_and_convert(url)
-
-                # Collect result: Markdown and image S3 URLs
-                markdown_results[url] = {
-                    "markdown_s3_url": result["markdown_s3_url"],
-                    "image_s3_urls": result["image_s3_urls"],
-                    "unique_folder": result["unique_folder"],
-                    "status": result["status"],
-                    "message": result["message"]
-                }
-            except Exception as e:
-                markdown_results[url] = {"error": str(e)}
+        # Follow links from the seed pages; every page goes through the open-source scraper
+        web_crawl = await get_backend("crawl")
+        options = {
+            name: value for name, value in
+            (("max_depth", data.max_depth), ("max_pages", data.max_pages), ("url_prefix", data.url_prefix))
+            if value is not None
+        }
+        crawler = web_crawl.SiteCrawler(data.urls, **options)
+        if not crawler.seed_urls:
+            raise HTTPException(status_code=400, detail="No valid http(s) seed URL was provided.")
 
-        return {"markdown_results": markdown_results}
+        async def results():
+            async for url, result in crawler.crawl():
+                yield url, {**scrape_result_fields(result), "depth": result["depth"]}
+
+        return await scrape_response(results(), None, stream)
 
+    except HTTPException:
+        raise
     except Exception as e:
-        # Handle unexpected errors
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 
@@ -84,8 +360,9 @@ async def process_pdf_enterprise_endpoint(file: UploadFile = File(...)):
         # Step 1: Read the uploaded file content
         file_content = await file.read()
 
-        # Step 2: Call the process_pdf function with env credentials
-        result = process_pdf_enterprise(file_content)
+        # Step 2: Submit the extract job; waiting on Adobe holds no worker thread
+        pdf_extract_enterprise = await get_backend("pdf_enterprise")
+        result = await pdf_extract_enterprise.process_pdf_enterprise_async(file_content)
 
         # Step 3: Return the S3 URLs and other details
         return {
@@ -96,37 +373,61 @@ async def process_pdf_enterprise_endpoint(file: UploadFile = File(...)):
             "status": result["status"]
         }
 
+    except QueueFullError as e:
+        return queue_full_response(e)
     except Exception as e:
         # Return a 500 error response in case of an exception
         return JSONResponse(content={"error": str(e)}, status_code=500)
     
 # Web Scraping Enterprise Endpoint
 @app.post("/scrape-web/enterprise")
-async def scrape_web_enterprise_endpoint(data:URLInput):
-    markdown_results = {}
-
+async def scrape_web_enterprise_endpoint(
+    data:URLInput,
+    stream: bool = Query(False),
+    diff: bool = Query(False, description="Upload a diff against the previous Markdown of changed pages")
+):
     try:
-        for url in data.urls:
-            try:
-                # Call the updated scrape_and_convert function
-                result = scrape_and_convert_enterprise(url)
-
-                # Collect result: Markdown and image S3 URLs
-                markdown_results[url] = {
-                    "markdown_s3_url": result["markdown_s3_url"],
-                    "image_s3_urls": result["image_s3_urls"],
-                    "unique_folder": result["unique_folder"],
-                    "status": result["status"],
-                    "message": result["message"]
-                }
-            
-            except Exception as e:
-                markdown_results[url] = {"error": str(e)}
-        return {"markdown_results": markdown_results}
+        # One actor run crawls every URL that changed; pages are uploaded as the crawler emits them
+        return await scrape_response(scrape_urls_enterprise(data.urls, diff), data.urls, stream)
     
     except Exception as e:
         raise HTTPException(status_code=500,detail=f"Internal Server Error: {str(e)}")
 
+# PDF Job Submission Endpoint
+@app.post("/jobs/pdf", status_code=202)
+async def submit_pdf_job_endpoint(file: UploadFile = File(...), enterprise: bool = Query(False)):
+    try:
+        # Step 1: Read the uploaded file content
+        file_content = await file.read()
+        if not file_content.startswith(b"%PDF"):
+            raise HTTPException(status_code=400, detail="The provided file is not a valid PDF.")
+
+        # Step 2: Spool the file and queue it for a worker
+        kind = "pdf_enterprise" if enterprise else "pdf"
+        job_id = await run_io_bound(app.state.job_queue.submit, kind, file_content)
+
+        # Step 3: Return the job ID to poll
+        return {
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/jobs/{job_id}"
+        }
+
+    except HTTPException:
+        raise
+    except QueueFullError as e:
+        return queue_full_response(e)
+    except Exception as e:
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+
+# Job Status Endpoint
+@app.get("/jobs/{job_id}")
+async def get_job_endpoint(job_id: str):
+    job = app.state.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
 #def handler(request, *args, **kwargs):
     #return app
 
@@ -0,0 +1,278 @@
+import io
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import zipfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+from adobe.pdfservices.operation.auth.service_principal_credentials import ServicePrincipalCredentials
+from adobe.pdfservices.operation.exception.exceptions import ServiceApiException, SdkException
+from adobe.pdfservices.operation.pdf_services_media_type import PDFServicesMediaType
+from adobe.pdfservices.operation.pdf_services_job_status import PDFServicesJobStatus
+from adobe.pdfservices.operation.pdf_services import PDFServices
+from adobe.pdfservices.operation.pdfjobs.jobs.extract_pdf_job import ExtractPDFJob
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_element_type import ExtractElementType
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_pdf_params import ExtractPDFParams
+from adobe.pdfservices.operation.pdfjobs.result.extract_pdf_result import ExtractPDFResult
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_renditions_element_type import ExtractRenditionsElementType
+
+# Load environment variables
+load_dotenv()
+CLIENT_ID = os.getenv("CLIENT_ID")
+CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+
+# Extract jobs running at Adobe at the same time, across all callers in this process
+ADOBE_MAX_IN_FLIGHT = int(os.getenv("ADOBE_MAX_IN_FLIGHT", "8"))
+# Threads making the blocking SDK calls (upload, submit, status, download)
+ADOBE_SDK_THREADS = int(os.getenv("ADOBE_SDK_THREADS", "8"))
+# Status polling starts at the initial interval and backs off up to the maximum
+ADOBE_POLL_INITIAL_SECONDS = float(os.getenv("ADOBE_POLL_INITIAL_SECONDS", "1"))
+ADOBE_POLL_MAX_SECONDS = float(os.getenv("ADOBE_POLL_MAX_SECONDS", "10"))
+ADOBE_JOB_TIMEOUT_SECONDS = float(os.getenv("ADOBE_JOB_TIMEOUT_SECONDS", "600"))
+# Attempts for SDK calls failing with throttling, server or network errors
+ADOBE_RETRIES = int(os.getenv("ADOBE_RETRIES", "4"))
+ADOBE_RETRY_BASE_SECONDS = float(os.getenv("ADOBE_RETRY_BASE_SECONDS", "1"))
+
+# Serve extractions from a local stand-in instead of Adobe (tests, benchmarks, offline development)
+ADOBE_PDF_SERVICES_STUB = os.getenv("ADOBE_PDF_SERVICES_STUB", "false").lower() == "true"
+ADOBE_STUB_LATENCY_SECONDS = float(os.getenv("ADOBE_STUB_LATENCY_SECONDS", "0.5"))
+
+IN_PROGRESS = PDFServicesJobStatus.IN_PROGRESS.get_value()
+DONE = PDFServicesJobStatus.DONE.get_value()
+
+
+class PDFServicesBackend:
+    """Blocking extract-job calls against Adobe PDF Services over one shared, token-caching client."""
+
+    def __init__(self):
+        self._pdf_services = None
+        self._lock = threading.Lock()
+
+    def _client(self) -> PDFServices:
+        # The SDK authenticator caches the access token and refreshes it shortly before it expires,
+        # so one instance per process avoids a token request per document
+        with self._lock:
+            if self._pdf_services is None:
+                credentials = ServicePrincipalCredentials(client_id=CLIENT_ID, client_secret=CLIENT_SECRET)
+                self._pdf_services = PDFServices(credentials=credentials)
+            return self._pdf_services
+
+    def start(self, file_content: bytes) -> str:
+        """Upload a PDF, submit an extract job for it and return the job's polling URL."""
+        pdf_services = self._client()
+        input_asset = pdf_services.upload(input_stream=file_content, mime_type=PDFServicesMediaType.PDF)
+        extract_pdf_params = ExtractPDFParams(
+            elements_to_extract=[ExtractElementType.TEXT, ExtractElementType.TABLES],
+            elements_to_extract_renditions=[ExtractRenditionsElementType.FIGURES, ExtractRenditionsElementType.TABLES]
+        )
+        extract_pdf_job = ExtractPDFJob(input_asset=input_asset, extract_pdf_params=extract_pdf_params)
+        return pdf_services.submit(extract_pdf_job)
+
+    def poll(self, job: str) -> tuple:
+        """Return (status, retry_after_seconds) of a submitted job."""
+        response = self._client().get_job_status(job)
+        try:
+            retry_after = response.get_retry_interval()
+        except (TypeError, ValueError):
+            retry_after = 0  # No usable Retry-After header
+        return response.get_status(), retry_after
+
+    def download(self, job: str) -> bytes:
+        """Return the result zip of a finished job."""
+        pdf_services = self._client()
+        # The job is done, so this returns after a single status request
+        pdf_services_response = pdf_services.get_job_result(job, ExtractPDFResult)
+        result_asset = pdf_services_response.get_result().get_resource()
+        return pdf_services.get_content(result_asset).get_input_stream()
+
+
+class StubPDFServicesBackend:
+    """A local stand-in for PDF Services returning a small, deterministic extract zip."""
+
+    # 1x1 transparent PNG used as the figure rendition
+    _PNG = bytes.fromhex(
+        "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+        "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+    )
+
+    def __init__(self, latency_seconds: float = ADOBE_STUB_LATENCY_SECONDS):
+        self.latency_seconds = latency_seconds
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def start(self, file_content: bytes) -> str:
+        job = hashlib.sha256(file_content).hexdigest()[:16] + f"-{time.monotonic_ns()}"
+        with self._lock:
+            self._jobs[job] = (time.monotonic() + self.latency_seconds, file_content)
+        return job
+
+    def poll(self, job: str) -> tuple:
+        with self._lock:
+            ready_at, _ = self._jobs[job]
+        remaining = ready_at - time.monotonic()
+        return (IN_PROGRESS, remaining) if remaining > 0 else (DONE, 0)
+
+    def download(self, job: str) -> bytes:
+        with self._lock:
+            _, file_content = self._jobs.pop(job)
+        structured_data = {
+            "elements": [
+                {"Path": "//Document/H1", "Text": "Stub extraction"},
+                {"Path": "//Document/P", "Text": f"{len(file_content)} bytes, sha256 {hashlib.sha256(file_content).hexdigest()}"},
+                {"Path": "//Document/Figure", "filePaths": ["figures/fileoutpart0.png"]},
+            ]
+        }
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            archive.writestr("structuredData.json", json.dumps(structured_data))
+            archive.writestr("figures/fileoutpart0.png", self._PNG)
+        return buffer.getvalue()
+
+
+def _retryable(e: Exception) -> bool:
+    # Throttling, server errors and network failures are worth another try; bad input is not
+    if isinstance(e, ServiceApiException):
+        return e.status_code == 429 or e.status_code >= 500
+    return isinstance(e, (SdkException, ConnectionError, TimeoutError))
+
+
+class ExtractJobRunner:
+    """
+    Keeps many extract jobs in flight on one background event loop.
+
+    Submissions and status polls are coroutines, so waiting on a remote job holds no thread;
+    a semaphore bounds the number of jobs at Adobe and the blocking SDK calls run on a small
+    thread pool.
+    """
+
+    def __init__(self, backend, max_in_flight: int = ADOBE_MAX_IN_FLIGHT, sdk_threads: int = ADOBE_SDK_THREADS):
+        """
+        Args:
+            backend: PDFServicesBackend or StubPDFServicesBackend.
+            max_in_flight (int): Jobs submitted and not yet downloaded at the same time.
+            sdk_threads (int): Threads available for the blocking SDK calls.
+        """
+        self.backend = backend
+        self.max_in_flight = max_in_flight
+        self._sdk_executor = ThreadPoolExecutor(max_workers=sdk_threads, thread_name_prefix="adobe-sdk")
+        self._loop = None
+        self._semaphore = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="adobe-poller", daemon=True).start()
+                self._semaphore = asyncio.Semaphore(self.max_in_flight)
+                self._loop = loop
+            return self._loop
+
+    async def _call(self, func, *args):
+        """Run a blocking SDK call off the loop, retrying transient failures with jittered backoff."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(ADOBE_RETRIES):
+            try:
+                return await loop.run_in_executor(self._sdk_executor, func, *args)
+            except Exception as e:
+                if attempt == ADOBE_RETRIES - 1 or not _retryable(e):
+                    raise
+                delay = ADOBE_RETRY_BASE_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5)
+                logging.warning(f"Adobe call {func.__name__} failed ({e}); retrying in {delay:.1f}s.")
+                await asyncio.sleep(delay)
+
+    async def _extract(self, file_content: bytes) -> bytes:
+        async with self._semaphore:
+            with self._lock:
+                self._in_flight += 1
+            try:
+                # Step 1: Upload the PDF and submit the extract job
+                job = await self._call(self.backend.start, file_content)
+                logging.debug(f"Adobe extract job submitted: {job}")
+
+                # Step 2: Poll with exponential backoff, never sooner than the service asks
+                deadline = time.monotonic() + ADOBE_JOB_TIMEOUT_SECONDS
+                interval = ADOBE_POLL_INITIAL_SECONDS
+                while True:
+                    status, retry_after = await self._call(self.backend.poll, job)
+                    if status == DONE:
+                        break
+                    if status != IN_PROGRESS:
+                        raise RuntimeError(f"Adobe extract job {status}: {job}")
+                    if time.monotonic() + interval > deadline:
+                        raise TimeoutError(f"Adobe extract job did not finish in {ADOBE_JOB_TIMEOUT_SECONDS}s: {job}")
+                    await asyncio.sleep(max(interval, retry_after or 0))
+                    interval = min(interval * 2, ADOBE_POLL_MAX_SECONDS)
+
+                # Step 3: Download the result zip
+                zip_content = await self._call(self.backend.download, job)
+                with self._lock:
+                    self._completed += 1
+                return zip_content
+            except Exception:
+                with self._lock:
+                    self._failed += 1
+                raise
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+
+    def submit(self, file_content: bytes):
+        """
+        Schedule an extraction on the runner's event loop.
+
+        Args:
+            file_content (bytes): The PDF to extract.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the bytes of the extract result zip.
+        """
+        return asyncio.run_coroutine_threadsafe(self._extract(file_content), self._get_loop())
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "stub" if isinstance(self.backend, StubPDFServicesBackend) else "adobe",
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_runner() -> ExtractJobRunner:
+    """Return the process-wide runner, backed by the stub when ADOBE_PDF_SERVICES_STUB is set."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            backend = StubPDFServicesBackend() if ADOBE_PDF_SERVICES_STUB else PDFServicesBackend()
+            _runner = ExtractJobRunner(backend)
+        return _runner
+
+
+def extract_pdf(file_content: bytes) -> bytes:
+    """Extract a PDF with Adobe PDF Services and return the result zip, blocking the calling thread."""
+    return get_runner().submit(file_content).result()
+
+
+async def extract_pdf_async(file_content: bytes) -> bytes:
+    """Extract a PDF with Adobe PDF Services and return the result zip without blocking the event loop."""
+    return await asyncio.wrap_future(get_runner().submit(file_content))
+
+
+def adobe_stats() -> dict:
+    """Return in-flight and completed job counts for the health endpoint."""
+    return get_runner().stats()
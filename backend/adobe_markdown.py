@@ -0,0 +1,180 @@
+import io
+import re
+import csv
+
+# Path components look like "Table[2]"; the index is 1-based and omitted for the first sibling
+_COMPONENT = re.compile(r"^([A-Za-z]+\d?)(?:\[(\d+)\])?$")
+_HEADINGS = {"Title": 1, "H1": 1, "H2": 2, "H3": 3, "H4": 4, "H5": 5, "H6": 6}
+_ORDERED_LABEL = re.compile(r"^\(?[0-9A-Za-z]{1,3}[.)]$")
+
+
+def _parse_path(path: str) -> list:
+    """Split an element Path such as //Document/Table[2]/TR[3]/TD/P into (role, index) pairs."""
+    components = []
+    for part in path.split("/"):
+        if not part or part == "Document":
+            continue
+        match = _COMPONENT.match(part)
+        if match:
+            components.append((match.group(1), int(match.group(2) or 1)))
+        else:
+            components.append((part, 1))
+    return components
+
+
+def _cell(text: str) -> str:
+    return text.strip().replace("|", "\\|").replace("\n", " ")
+
+
+def _table_rows_to_markdown(rows: list) -> str:
+    """Render a list of rows (lists of cell strings) as a Markdown table, the first row as header."""
+    rows = [row for row in rows if any(cell.strip() for cell in row)]
+    if not rows:
+        return ""
+    width = max(len(row) for row in rows)
+    lines = []
+    for i, row in enumerate(rows):
+        cells = [_cell(cell) for cell in row] + [""] * (width - len(row))
+        lines.append("| " + " | ".join(cells) + " |")
+        if i == 0:
+            lines.append("|" + " --- |" * width)
+    return "\n".join(lines)
+
+
+class _TableBuilder:
+    """Collects the cell texts of one table while its elements stream past."""
+
+    def __init__(self, key: tuple, has_csv: bool):
+        self.key = key
+        self.has_csv = has_csv  # The CSV rendition is authoritative; cell elements are skipped
+        self.cells = {}
+
+    def add(self, components: list, text: str) -> None:
+        if self.has_csv:
+            return
+        row = col = None
+        for role, index in components:
+            if role == "TR":
+                row = index
+            elif role in ("TD", "TH") and row is not None:
+                col = index
+        if row is None or col is None:
+            return
+        cell = self.cells.setdefault((row, col), [])
+        cell.append(text.strip())
+
+    def to_markdown(self) -> str:
+        if not self.cells:
+            return ""
+        row_count = max(row for row, _ in self.cells)
+        col_count = max(col for _, col in self.cells)
+        return _table_rows_to_markdown([
+            [" ".join(self.cells.get((row, col), [])) for col in range(1, col_count + 1)]
+            for row in range(1, row_count + 1)
+        ])
+
+
+def _table_key(components: list) -> tuple:
+    """Identify a table by its path up to and including the Table component."""
+    key = []
+    for component in components:
+        key.append(component)
+        if component[0] == "Table":
+            break
+    return tuple(key)
+
+
+def render_markdown(elements, rendition_urls: dict = None, read_file=None):
+    """
+    Render Adobe structuredData.json elements as Markdown in a single pass.
+
+    Headings (Title, H1-H6) become # headings, lists (L/LI/Lbl/LBody) become nested bullet or
+    numbered items, tables become Markdown tables (from their CSV export when there is one, else
+    from the TR/TD cell elements) and figures and table renditions become image links.
+
+    Args:
+        elements: Iterable of element dicts in document order; consumed lazily.
+        rendition_urls (dict): Maps archive file paths (e.g. 'figures/fileoutpart3.png') to S3 URLs.
+        read_file (callable): Returns the bytes of an archive file path, used for table CSVs.
+
+    Yields:
+        str: Markdown blocks in document order.
+    """
+    rendition_urls = rendition_urls or {}
+    table = None
+    list_label = None
+    in_list = False
+
+    for element in elements:
+        components = _parse_path(element.get("Path", ""))
+        roles = [role for role, _ in components]
+        text = element.get("Text")
+
+        # Step 1: Close an open list or table as soon as an element outside it arrives
+        if in_list and "L" not in roles:
+            yield "\n"
+            in_list = False
+        if table is not None and ("Table" not in roles or _table_key(components) != table.key):
+            block = table.to_markdown()
+            if block:
+                yield block + "\n\n"
+            table = None
+
+        # Step 2: Tables start with an element carrying their renditions, followed by their cells
+        if "Table" in roles:
+            if table is None:
+                file_paths = element.get("filePaths") or []
+                csv_paths = [path for path in file_paths if path.lower().endswith(".csv")]
+                table = _TableBuilder(_table_key(components), bool(csv_paths and read_file))
+                for path in file_paths:
+                    if path in rendition_urls:
+                        yield f"![Table]({rendition_urls[path]})\n\n"
+                for path in csv_paths:
+                    if read_file:
+                        rows = list(csv.reader(io.StringIO(read_file(path).decode("utf-8-sig", errors="replace"))))
+                        block = _table_rows_to_markdown(rows)
+                        if block:
+                            yield block + "\n\n"
+            if text:
+                table.add(components, text)
+            continue
+
+        # Step 3: Figures link to their uploaded renditions
+        if "Figure" in roles:
+            for path in element.get("filePaths") or []:
+                if path in rendition_urls:
+                    yield f"![Figure]({rendition_urls[path]})\n\n"
+            if text and text.strip():
+                yield text.strip() + "\n\n"
+            continue
+
+        if not text or not text.strip():
+            continue
+        text = text.strip()
+
+        # Step 4: List labels are remembered and prefixed to the body that follows them
+        if "L" in roles:
+            depth = roles.count("L") - 1
+            if roles[-1] == "Lbl":
+                list_label = text
+                continue
+            marker = list_label if list_label and _ORDERED_LABEL.match(list_label) else "-"
+            list_label = None
+            in_list = True
+            yield f"{'  ' * depth}{marker} {text}\n"
+            continue
+
+        # Step 5: Headings, then everything else as a paragraph
+        heading = next((_HEADINGS[role] for role in reversed(roles) if role in _HEADINGS), None)
+        if heading:
+            yield f"{'#' * heading} {text}\n\n"
+        else:
+            yield text + "\n\n"
+
+    if in_list:
+        yield "\n"
+    if table is not None:
+        block = table.to_markdown()
+        if block:
+            yield block + "\n\n"
+
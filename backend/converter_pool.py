@@ -0,0 +1,269 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from queue import Queue, Empty
+from contextlib import contextmanager
+
+IMAGE_RESOLUTION_SCALE = 2.0
+
+# Named pipeline option profiles; every profile gets its own pool of warm converters.
+# fast: text only, no OCR, table structure or rasterized images
+# standard: pictures and tables, without the full-page images nobody uses
+# full: everything at 2x, the original behaviour
+PIPELINE_PROFILES = {
+    "fast": {
+        "do_ocr": False,
+        "images_scale": 1.0,
+        "generate_page_images": False,
+        "generate_picture_images": False,
+        "do_table_structure": False,
+    },
+    "standard": {
+        "do_ocr": True,
+        "images_scale": 1.0,
+        "generate_page_images": False,
+        "generate_picture_images": True,
+        "do_table_structure": True,
+    },
+    "full": {
+        "do_ocr": True,
+        "images_scale": IMAGE_RESOLUTION_SCALE,
+        "generate_page_images": True,
+        "generate_picture_images": True,
+        "do_table_structure": True,
+    },
+}
+DEFAULT_PROFILE = "full"
+
+# Bounds for the per-request images_scale override
+MIN_IMAGES_SCALE = 0.25
+MAX_IMAGES_SCALE = 4.0
+
+# Number of converters kept per profile and how long a request waits for a free one
+CONVERTER_POOL_SIZE = int(os.getenv("CONVERTER_POOL_SIZE", "1"))
+CONVERTER_ACQUIRE_TIMEOUT = float(os.getenv("CONVERTER_ACQUIRE_TIMEOUT", "300"))
+
+
+def resolve_profile(profile: str = DEFAULT_PROFILE, do_ocr: bool = None, images_scale: float = None) -> str:
+    """
+    Combine a named profile with per-request overrides into a profile key.
+
+    Args:
+        profile (str): Name of the profile in PIPELINE_PROFILES.
+        do_ocr (bool): Turn OCR on or off; None keeps the profile's setting.
+        images_scale (float): Rasterization scale for extracted images; None keeps the profile's setting.
+
+    Returns:
+        str: A key such as 'fast' or 'full;do_ocr=False;images_scale=1.5' that identifies
+             the converter pool and can be passed to worker processes.
+    """
+    if profile not in PIPELINE_PROFILES:
+        raise ValueError(f"Unknown pipeline profile: {profile}. Choose one of {sorted(PIPELINE_PROFILES)}")
+
+    key = [profile]
+    if do_ocr is not None and do_ocr != PIPELINE_PROFILES[profile]["do_ocr"]:
+        key.append(f"do_ocr={bool(do_ocr)}")
+    if images_scale is not None and float(images_scale) != PIPELINE_PROFILES[profile]["images_scale"]:
+        if not MIN_IMAGES_SCALE <= images_scale <= MAX_IMAGES_SCALE:
+            raise ValueError(f"images_scale must be between {MIN_IMAGES_SCALE} and {MAX_IMAGES_SCALE}")
+        key.append(f"images_scale={float(images_scale)}")
+    return ";".join(key)
+
+
+def profile_options(profile: str = DEFAULT_PROFILE) -> dict:
+    """Return the pipeline options of a profile key produced by resolve_profile."""
+    name, *overrides = profile.split(";")
+    if name not in PIPELINE_PROFILES:
+        raise ValueError(f"Unknown pipeline profile: {name}")
+
+    options = dict(PIPELINE_PROFILES[name])
+    for override in overrides:
+        option, value = override.split("=", 1)
+        options[option] = value == "True" if option == "do_ocr" else float(value)
+    return options
+
+
+def build_pipeline_options(profile: str = DEFAULT_PROFILE) -> "PdfPipelineOptions":
+    """
+    Build the docling pipeline options for a profile key.
+
+    Args:
+        profile (str): A profile name or a key produced by resolve_profile.
+
+    Returns:
+        PdfPipelineOptions: Pipeline options configured for the profile.
+    """
+    # docling (and torch behind it) is imported on first use so profile handling stays cheap
+    from docling.datamodel.pipeline_options import PdfPipelineOptions
+
+    pipeline_options = PdfPipelineOptions()
+    for option, value in profile_options(profile).items():
+        setattr(pipeline_options, option, value)
+    return pipeline_options
+
+
+def pipeline_fingerprint(profile: str = DEFAULT_PROFILE) -> str:
+    """Return a short stable digest of a profile's options, used to key cached results."""
+    options = json.dumps(profile_options(profile), sort_keys=True)
+    return hashlib.sha256(options.encode("utf-8")).hexdigest()[:16]
+
+
+class ConverterPool:
+    """A bounded pool of warm DocumentConverter instances for one pipeline profile."""
+
+    def __init__(self, profile: str, size: int = CONVERTER_POOL_SIZE):
+        self.profile = profile
+        self.size = max(1, size)
+        self._idle = Queue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._conversions = 0
+        self.state = "cold"
+        self.last_error = None
+        self.warm_up_seconds = None
+
+    def _create_converter(self) -> tuple:
+        """Construct a converter and load its models; returns the converter and load time."""
+        from docling.datamodel.base_models import InputFormat
+        from docling.document_converter import DocumentConverter, PdfFormatOption
+
+        started = time.perf_counter()
+        doc_converter = DocumentConverter(
+            format_options={
+                InputFormat.PDF: PdfFormatOption(pipeline_options=build_pipeline_options(self.profile))
+            }
+        )
+        doc_converter.initialize_pipeline(InputFormat.PDF)
+        elapsed = time.perf_counter() - started
+        logging.debug(f"DocumentConverter for profile '{self.profile}' initialized in {elapsed:.2f}s.")
+        return doc_converter, elapsed
+
+    def _reserve_slot(self) -> bool:
+        """Reserve capacity for a new converter if the pool has not reached its size."""
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return True
+            return False
+
+    def _new_converter(self) -> "DocumentConverter":
+        try:
+            doc_converter, elapsed = self._create_converter()
+        except Exception as e:
+            with self._lock:
+                self._created -= 1
+                self.state = "error"
+                self.last_error = str(e)
+            raise
+        with self._lock:
+            if self.warm_up_seconds is None:
+                self.warm_up_seconds = round(elapsed, 3)
+            self.state = "ready"
+            self.last_error = None
+        return doc_converter
+
+    def warm_up(self) -> None:
+        """Create one converter up front so requests never pay the model load."""
+        if not self._reserve_slot():
+            return
+        with self._lock:
+            self.state = "warming"
+        try:
+            doc_converter = self._new_converter()
+        except Exception:
+            with self._lock:
+                self.state = "failed"  # Until a request manages to create a converter
+            raise
+        self._idle.put(doc_converter)
+
+    @contextmanager
+    def acquire(self, timeout: float = CONVERTER_ACQUIRE_TIMEOUT):
+        """
+        Check a converter out of the pool for the duration of a conversion.
+
+        Args:
+            timeout (float): Seconds to wait for a free converter before giving up.
+
+        Yields:
+            DocumentConverter: A warm converter owned by the caller until the block exits.
+        """
+        try:
+            doc_converter = self._idle.get_nowait()
+        except Empty:
+            if self._reserve_slot():
+                doc_converter = self._new_converter()
+            else:
+                try:
+                    doc_converter = self._idle.get(timeout=timeout)
+                except Empty:
+                    raise TimeoutError(f"No free converter for profile '{self.profile}' after {timeout}s")
+
+        with self._lock:
+            self._in_use += 1
+        try:
+            yield doc_converter
+        finally:
+            with self._lock:
+                self._in_use -= 1
+                self._conversions += 1
+            self._idle.put(doc_converter)
+
+    def health(self) -> dict:
+        """Return the warm-up and utilisation state of the pool."""
+        with self._lock:
+            return {
+                "state": self.state,
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "conversions": self._conversions,
+                "warm_up_seconds": self.warm_up_seconds,
+                "last_error": self.last_error,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(profile: str = DEFAULT_PROFILE) -> ConverterPool:
+    """Return the process-wide converter pool for a profile key, creating it on first use."""
+    profile_options(profile)  # Validates the key
+    with _pools_lock:
+        if profile not in _pools:
+            _pools[profile] = ConverterPool(profile)
+        return _pools[profile]
+
+
+def acquire_converter(profile: str = DEFAULT_PROFILE):
+    """Shortcut for get_pool(profile).acquire()."""
+    return get_pool(profile).acquire()
+
+
+def warm_up(profiles: list = None) -> dict:
+    """
+    Load the models for the given profiles so they are ready before the first request.
+
+    Args:
+        profiles (list): Profile names to warm; defaults to DEFAULT_PROFILE only.
+
+    Returns:
+        dict: The health state of every pool after warm-up.
+    """
+    for profile in profiles or [DEFAULT_PROFILE]:
+        try:
+            get_pool(profile).warm_up()
+        except Exception as e:
+            logging.error(f"Warm-up of profile '{profile}' failed: {e}", exc_info=True)
+    return pool_health()
+
+
+def pool_health() -> dict:
+    """Return the health state of every converter pool keyed by profile."""
+    with _pools_lock:
+        pools = dict(_pools)
+    return {profile: pool.health() for profile, pool in pools.items()}
@@ -0,0 +1,278 @@
+import os
+import asyncio
+import logging
+import threading
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+
+from backend.converter_pool import pool_health, warm_up
+from backend.metrics import call_collecting, registry as metrics_registry
+
+# CPU-bound docling conversions run in worker processes; 0 keeps them on the I/O thread pool
+PDF_PROCESS_WORKERS = int(os.getenv("PDF_PROCESS_WORKERS", "2"))
+PDF_QUEUE_DEPTH = int(os.getenv("PDF_QUEUE_DEPTH", "8"))
+
+# Scraping, S3 uploads and remote enterprise services are I/O-bound and share a thread pool
+IO_THREAD_WORKERS = int(os.getenv("IO_THREAD_WORKERS", "16"))
+IO_QUEUE_DEPTH = int(os.getenv("IO_QUEUE_DEPTH", "64"))
+
+
+class QueueFullError(RuntimeError):
+    """Raised when an executor already has as much waiting work as it is allowed to queue."""
+
+
+def _init_process_worker(profiles: list) -> None:
+    # Every worker process keeps its own warm converter pool
+    warm_up(profiles)
+
+
+def _report_health() -> tuple:
+    """Return (pid, converter pool health) of the worker process running it."""
+    return os.getpid(), pool_health()
+
+
+def _call_in_worker(func, *args):
+    """
+    Run func(*args) in a conversion worker and hand back its metrics and converter pool health.
+
+    Returns:
+        tuple: (result, metrics snapshot, (pid, pool health)); on failure the health report
+               travels on the exception as worker_health, next to metrics_snapshot.
+    """
+    try:
+        result, snapshot = call_collecting(func, *args)
+    except Exception as e:
+        e.worker_health = _report_health()
+        raise
+    return result, snapshot, _report_health()
+
+
+class BoundedExecutor:
+    """An executor wrapper that rejects new work once its queue depth limit is reached."""
+
+    def __init__(self, name: str, factory, workers: int, queue_depth: int):
+        self.name = name
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self._factory = factory
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._factory()
+            return self._executor
+
+    def _release(self, future) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            if not future.cancelled() and isinstance(future.exception(), BrokenExecutor):
+                # A worker process died (e.g. OOM); start a fresh pool for the next request
+                logging.error(f"The {self.name} executor is broken, recreating it.")
+                self._executor = None
+
+    def submit(self, func, *args):
+        """
+        Submit work to the underlying executor.
+
+        Args:
+            func: A picklable callable (process pools) or any callable (thread pools).
+            *args: Positional arguments passed to func.
+
+        Returns:
+            concurrent.futures.Future: The future of the submitted work.
+        """
+        with self._lock:
+            if self._pending >= self.workers + self.queue_depth:
+                self._rejected += 1
+                raise QueueFullError(f"The {self.name} queue is full ({self._pending} tasks pending)")
+            self._pending += 1
+
+        try:
+            future = self._get_executor().submit(func, *args)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, func, *args):
+        """Run func(*args) in the executor and await its result without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_depth": self.queue_depth,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+
+_warm_profiles = []
+_warm_up_state = "cold"  # cold, warming, ready or failed
+
+# pid -> converter pool health of the most recently heard-from conversion workers
+_worker_health = OrderedDict()
+_worker_health_lock = threading.Lock()
+
+
+def _record_worker_health(report) -> None:
+    if report is None:
+        return
+    pid, health = report
+    with _worker_health_lock:
+        _worker_health[pid] = health
+        _worker_health.move_to_end(pid)
+        while len(_worker_health) > max(1, PDF_PROCESS_WORKERS):
+            _worker_health.popitem(last=False)  # Workers replaced after a crash stop reporting
+
+io_executor = BoundedExecutor(
+    "io",
+    lambda: ThreadPoolExecutor(max_workers=IO_THREAD_WORKERS, thread_name_prefix="io-worker"),
+    IO_THREAD_WORKERS,
+    IO_QUEUE_DEPTH,
+)
+
+cpu_executor = BoundedExecutor(
+    "pdf",
+    lambda: ProcessPoolExecutor(
+        max_workers=PDF_PROCESS_WORKERS,
+        # spawn avoids forking a multi-threaded server process
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_process_worker,
+        initargs=(_warm_profiles,),
+    ),
+    PDF_PROCESS_WORKERS,
+    PDF_QUEUE_DEPTH,
+) if PDF_PROCESS_WORKERS > 0 else io_executor
+
+
+async def run_cpu_bound(func, *args):
+    """Run a CPU-bound callable (docling conversion) in the process pool."""
+    if cpu_executor is io_executor:
+        return await cpu_executor.run(func, *args)
+
+    # Metrics and converter health recorded inside the worker process are shipped back and merged here
+    try:
+        result, snapshot, health = await cpu_executor.run(_call_in_worker, func, *args)
+    except Exception as e:
+        metrics_registry.merge(getattr(e, "metrics_snapshot", None))
+        _record_worker_health(getattr(e, "worker_health", None))
+        raise
+    metrics_registry.merge(snapshot)
+    _record_worker_health(health)
+    return result
+
+
+def run_cpu_bound_sync(func, *args):
+    """
+    Blocking counterpart of run_cpu_bound for threads outside the event loop, e.g. job workers.
+
+    Raises QueueFullError when the process pool has no room; without a process pool
+    (PDF_PROCESS_WORKERS=0) func runs on the calling thread.
+    """
+    if cpu_executor is io_executor:
+        return func(*args)
+    return cpu_bound_result(submit_cpu_bound(func, *args))
+
+
+def submit_cpu_bound(func, *args):
+    """
+    Queue func(*args) on the process pool without waiting for it, e.g. to fan out PDF shards.
+
+    Raises QueueFullError when the pool has no room. Pass the returned future to
+    cpu_bound_result to get the result along with the worker's metrics and health.
+    """
+    return cpu_executor.submit(_call_in_worker, func, *args)
+
+
+def cpu_bound_result(future):
+    """Wait for a submit_cpu_bound future, merging the worker's metrics and converter health."""
+    try:
+        result, snapshot, health = future.result()
+    except Exception as e:
+        metrics_registry.merge(getattr(e, "metrics_snapshot", None))
+        _record_worker_health(getattr(e, "worker_health", None))
+        raise
+    metrics_registry.merge(snapshot)
+    _record_worker_health(health)
+    return result
+
+
+async def run_io_bound(func, *args):
+    """Run a blocking I/O-bound callable (scraping, S3, remote APIs) in the thread pool."""
+    return await io_executor.run(func, *args)
+
+
+def start_pools(profiles: list) -> None:
+    """
+    Warm the converter models wherever conversions will run.
+
+    Args:
+        profiles (list): Pipeline profiles to load before the first request.
+    """
+    global _warm_up_state
+    _warm_profiles[:] = profiles
+    _warm_up_state = "warming"
+    try:
+        if cpu_executor is io_executor:
+            reports = [(os.getpid(), warm_up(profiles))]
+        else:
+            # Process workers start on demand; one health check per worker spawns and warms them all
+            futures = [cpu_executor.submit(_report_health) for _ in range(PDF_PROCESS_WORKERS)]
+            reports = [future.result() for future in futures]
+            for report in reports:
+                _record_worker_health(report)
+    except Exception:
+        _warm_up_state = "failed"
+        raise
+    failed = any(pool["state"] == "failed" for _, health in reports for pool in health.values())
+    _warm_up_state = "failed" if failed else "ready"
+
+
+def warm_up_state() -> str:
+    """Return 'cold', 'warming', 'ready' or 'failed' for the converter warm-up started by start_pools."""
+    return _warm_up_state
+
+
+def converter_health() -> dict:
+    """
+    Return the converter pool health wherever conversions run.
+
+    In process mode each worker's pools are keyed by 'worker-<pid>', as last reported by the
+    worker alongside a conversion or the warm-up.
+    """
+    if cpu_executor is io_executor:
+        return pool_health()
+    with _worker_health_lock:
+        return {f"worker-{pid}": health for pid, health in _worker_health.items()}
+
+
+def shutdown_pools() -> None:
+    """Stop both executors, cancelling work that has not started yet."""
+    cpu_executor.shutdown()
+    io_executor.shutdown()
+
+
+def executor_stats() -> dict:
+    """Return pool sizes and queue state for the health endpoint."""
+    return {
+        "pdf": cpu_executor.stats() if cpu_executor is not io_executor else "shared with io",
+        "io": io_executor.stats(),
+    }
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from uuid import uuid4
+from pathlib import Path
+from email.utils import parsedate_to_datetime
+
+from backend import http_client
+
+# On-disk HTTP cache shared by the page and image fetches of the scrapers
+HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+HTTP_CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", "http_cache"))
+# Bounds matching the result cache: entries not validated for this long are dropped, and the least
+# recently used entries are evicted beyond the entry and size limits
+HTTP_CACHE_TTL_SECONDS = int(os.getenv("HTTP_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "10000"))
+HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "1024"))
+# Stores between two eviction sweeps of the cache directory
+HTTP_CACHE_SWEEP_EVERY = int(os.getenv("HTTP_CACHE_SWEEP_EVERY", "100"))
+
+_stores_since_sweep = 0
+_sweep_lock = threading.Lock()
+
+
+class CachedResponse:
+    """The parts of an HTTP response the scrapers use, whether it came from the network or the cache."""
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: dict, encoding: str = None,
+                 from_cache: bool = False, not_modified: bool = False):
+        self.url = url  # Where the content came from after redirects, not necessarily the requested URL
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding
+        self.from_cache = from_cache      # Served without contacting the server
+        self.not_modified = not_modified  # Server answered 304 to a conditional request
+
+    @property
+    def unchanged(self) -> bool:
+        """True when the content is the same as the last time this URL was fetched."""
+        return self.from_cache or self.not_modified
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+
+def _cache_paths(url: str) -> tuple:
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return HTTP_CACHE_DIR / f"{key}.json", HTTP_CACHE_DIR / f"{key}.body"
+
+
+def _freshness(headers) -> tuple:
+    """Return (storable, max_age_seconds) from the Cache-Control and Expires headers."""
+    directives = {}
+    for directive in headers.get("Cache-Control", "").lower().split(","):
+        name, _, value = directive.strip().partition("=")
+        if name:
+            directives[name] = value.strip('"')
+
+    if "no-store" in directives:
+        return False, 0
+    if "no-cache" in directives:
+        return True, 0
+    if directives.get("max-age", "").isdigit():
+        return True, int(directives["max-age"])
+    if headers.get("Expires"):
+        try:
+            return True, max(0, int(parsedate_to_datetime(headers["Expires"]).timestamp() - time.time()))
+        except (TypeError, ValueError):
+            return True, 0
+    return True, 0
+
+
+def _remove(meta_path: Path) -> None:
+    """Delete an entry, body first, so a reader never finds metadata without its body."""
+    for path in (meta_path.with_suffix(".body"), meta_path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _load(url: str) -> tuple:
+    meta_path, body_path = _cache_paths(url)
+    try:
+        meta, content = json.loads(meta_path.read_text(encoding="utf-8")), body_path.read_bytes()
+    except (OSError, ValueError):
+        return None, None
+    if time.time() - meta["stored_at"] > HTTP_CACHE_TTL_SECONDS:
+        _remove(meta_path)
+        return None, None
+    try:
+        os.utime(meta_path)  # The metadata file's mtime records the last access for LRU eviction
+    except OSError:
+        pass
+    return meta, content
+
+
+def _sweep() -> None:
+    """Drop expired entries and evict the least recently used ones beyond the entry and size limits."""
+    entries = []
+    now = time.time()
+    for meta_path in HTTP_CACHE_DIR.glob("*.json"):
+        try:
+            last_access = meta_path.stat().st_mtime
+            size = meta_path.with_suffix(".body").stat().st_size
+        except OSError:
+            continue
+        if now - last_access > HTTP_CACHE_TTL_SECONDS:
+            _remove(meta_path)
+        else:
+            entries.append((last_access, size, meta_path))
+
+    entries.sort(reverse=True)  # Most recently used first
+    kept, kept_bytes, evicted = 0, 0, 0
+    for _, size, meta_path in entries:
+        if kept < HTTP_CACHE_MAX_ENTRIES and kept_bytes + size <= HTTP_CACHE_MAX_MB * 1024 * 1024:
+            kept += 1
+            kept_bytes += size
+        else:
+            _remove(meta_path)
+            evicted += 1
+    if evicted:
+        logging.debug(f"Evicted {evicted} HTTP cache entries; {kept} entries ({kept_bytes} bytes) kept.")
+
+
+def _maybe_sweep() -> None:
+    global _stores_since_sweep
+    with _sweep_lock:
+        _stores_since_sweep += 1
+        if _stores_since_sweep < HTTP_CACHE_SWEEP_EVERY:
+            return
+        _stores_since_sweep = 0
+        _sweep()
+
+
+def _store(url: str, meta: dict, content: bytes = None) -> None:
+    HTTP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    meta_path, body_path = _cache_paths(url)
+    # Write-then-rename so concurrent readers never see a half-written entry
+    suffix = f".{uuid4().hex[:8]}.tmp"
+    if content is not None:
+        temp_body_path = Path(f"{body_path}{suffix}")
+        temp_body_path.write_bytes(content)
+        os.replace(temp_body_path, body_path)
+    temp_meta_path = Path(f"{meta_path}{suffix}")
+    temp_meta_path.write_text(json.dumps(meta), encoding="utf-8")
+    os.replace(temp_meta_path, meta_path)
+    if content is not None:
+        _maybe_sweep()
+
+
+def cached_get(url: str, timeout=http_client.DEFAULT_TIMEOUT, get=http_client.get) -> CachedResponse:
+    """
+    GET a URL through the local cache, revalidating stale entries with conditional requests.
+
+    Args:
+        url (str): The URL to fetch.
+        timeout: Timeout passed to the underlying request.
+        get: Function performing the request, called as get(url, headers=..., timeout=...).
+
+    Returns:
+        CachedResponse: The response; raises requests.HTTPError for error statuses.
+    """
+    if not HTTP_CACHE_ENABLED:
+        response = get(url, timeout=timeout)
+        response.raise_for_status()
+        return CachedResponse(response.url, response.status_code, response.content, dict(response.headers),
+                              response.encoding)
+
+    meta, content = _load(url)
+    now = time.time()
+    if meta is not None and now - meta["stored_at"] < meta["max_age"]:
+        return CachedResponse(meta.get("final_url", url), meta["status_code"], content, meta["headers"], meta["encoding"],
+                              from_cache=True)
+
+    request_headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            request_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            request_headers["If-Modified-Since"] = meta["last_modified"]
+
+    response = get(url, headers=request_headers, timeout=timeout)
+    if response.status_code == 304 and meta is not None:
+        # Unchanged: refresh the freshness lifetime and serve the stored body
+        _, max_age = _freshness(response.headers)
+        meta.update(stored_at=now, max_age=max_age, etag=response.headers.get("ETag", meta.get("etag")))
+        _store(url, meta)
+        return CachedResponse(meta.get("final_url", url), meta["status_code"], content, meta["headers"], meta["encoding"],
+                              not_modified=True)
+    if response.status_code == 304:
+        # A 304 without a stored body to serve (e.g. the entry was evicted meanwhile): fetch it whole
+        response = get(url, timeout=timeout)
+
+    response.raise_for_status()
+    storable, max_age = _freshness(response.headers)
+    etag, last_modified = response.headers.get("ETag"), response.headers.get("Last-Modified")
+    if storable and (max_age or etag or last_modified):
+        _store(url, {
+            "url": url,
+            "final_url": response.url,
+            "status_code": response.status_code,
+            "headers": {name: response.headers[name] for name in ("Content-Type",) if name in response.headers},
+            "encoding": response.encoding,
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": now,
+            "max_age": max_age,
+        }, response.content)
+    return CachedResponse(response.url, response.status_code, response.content, dict(response.headers), response.encoding)
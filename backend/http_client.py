@@ -0,0 +1,89 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# One keep-alive connection pool per process, shared by both scrapers
+HTTP_POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", "32"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+HTTP_PER_HOST_LIMIT = int(os.getenv("HTTP_PER_HOST_LIMIT", "4"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+DEFAULT_TIMEOUT = (
+    float(os.getenv("HTTP_CONNECT_TIMEOUT", "5")),
+    float(os.getenv("HTTP_READ_TIMEOUT", "30")),
+)
+USER_AGENT = os.getenv("HTTP_USER_AGENT", "Mozilla/5.0 (compatible; DAMG7245-Scraper/1.0)")
+
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+
+def _build_session() -> requests.Session:
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,  # Exponential: 0.5s, 1s, 2s, ...
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+
+session = _build_session()
+
+
+def _host_limit(url: str) -> threading.BoundedSemaphore:
+    """Return the semaphore capping concurrent requests to the host of a URL."""
+    host = urlparse(url).netloc
+    with _host_limits_lock:
+        if host not in _host_limits:
+            _host_limits[host] = threading.BoundedSemaphore(HTTP_PER_HOST_LIMIT)
+        return _host_limits[host]
+
+
+@contextmanager
+def host_slot(url: str, deadline: float = None):
+    """
+    Hold one of the HTTP_PER_HOST_LIMIT request slots for the host of a URL.
+
+    Args:
+        url (str): The URL about to be requested.
+        deadline (float): time.monotonic() value after which waiting for a slot is abandoned.
+    """
+    limit = _host_limit(url)
+    timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+    if not limit.acquire(timeout=timeout):
+        raise TimeoutError(f"Deadline reached while waiting to request {url}")
+    try:
+        yield
+    finally:
+        limit.release()
+
+
+def get(url: str, headers: dict = None, timeout=DEFAULT_TIMEOUT, deadline: float = None) -> requests.Response:
+    """
+    GET a URL over the shared session, with retries and the per-host concurrency limit.
+
+    Args:
+        url (str): The URL to fetch.
+        headers (dict): Extra request headers.
+        timeout: (connect, read) timeout in seconds.
+        deadline (float): time.monotonic() value after which waiting for a host slot is abandoned.
+
+    Returns:
+        requests.Response: The response; the caller decides how to treat error statuses.
+    """
+    with host_slot(url, deadline):
+        return session.get(url, headers=headers, timeout=timeout)
@@ -0,0 +1,167 @@
+import io
+import os
+import re
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image  # Optional: without Pillow images are only deduplicated, not re-encoded
+except ImportError:
+    Image = None
+
+from backend.metrics import registry as metrics_registry
+from storage.result_cache import get_result_cache
+from storage.s3_utils import UploadItem, upload_many
+
+# Images smaller than this in either dimension (tracking pixels, spacers, bullets) are dropped
+IMAGE_MIN_DIMENSION = int(os.getenv("IMAGE_MIN_DIMENSION", "16"))
+# Longest side after downsizing; 0 keeps the original size
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2000"))
+# Upload format: 'webp', 'png' (optimized) or 'original' to upload the bytes as downloaded
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "webp").lower()
+IMAGE_WEBP_QUALITY = int(os.getenv("IMAGE_WEBP_QUALITY", "85"))
+# Decoding, resizing and encoding release the GIL in Pillow, so a thread pool scales across cores
+IMAGE_PROCESS_WORKERS = int(os.getenv("IMAGE_PROCESS_WORKERS", str(os.cpu_count() or 4)))
+# Images read into memory at a time by callers that load them lazily, e.g. from an Adobe result zip
+IMAGE_BATCH_SIZE = int(os.getenv("IMAGE_BATCH_SIZE", "32"))
+
+# Identifies the settings above; uploads made with other settings are not reused
+IMAGE_FINGERPRINT = f"image:{IMAGE_MIN_DIMENSION}:{IMAGE_MAX_DIMENSION}:{IMAGE_FORMAT}:{IMAGE_WEBP_QUALITY}:v1"
+
+_WEB_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg"}
+_FORMAT_EXTENSIONS = {"PNG": ".png", "JPEG": ".jpg", "GIF": ".gif", "WEBP": ".webp"}
+
+_process_executor = ThreadPoolExecutor(max_workers=IMAGE_PROCESS_WORKERS, thread_name_prefix="image-process")
+
+# Content hash -> S3 URL of an earlier upload (or None for an image that was dropped), across all pipelines
+image_upload_cache = get_result_cache("image_uploads")
+
+
+def _encode(image, lossless: bool) -> tuple:
+    """Encode a decoded image in IMAGE_FORMAT and return (content, extension)."""
+    if image.mode not in ("RGB", "RGBA"):
+        has_alpha = image.mode in ("LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    buffer = io.BytesIO()
+    if IMAGE_FORMAT == "png":
+        image.save(buffer, "PNG", optimize=True)
+        return buffer.getvalue(), ".png"
+    if lossless:
+        image.save(buffer, "WEBP", lossless=True, method=4)
+    else:
+        image.save(buffer, "WEBP", quality=IMAGE_WEBP_QUALITY, method=4)
+    return buffer.getvalue(), ".webp"
+
+
+def normalize_image(content: bytes, extension: str) -> tuple:
+    """
+    Drop, downsize and re-encode one image for upload.
+
+    Args:
+        content (bytes): The image as downloaded or rendered.
+        extension (str): Its file extension, e.g. '.png'; used when the bytes are kept as they are.
+
+    Returns:
+        tuple: (content, extension) to upload, or None when the image is too small to keep.
+               Images Pillow cannot read, vector and animated images are returned unchanged.
+    """
+    extension = (extension or "").lower()
+    if not re.fullmatch(r"\.[a-z0-9]{1,5}", extension):
+        extension = ""  # e.g. '.php?size=2' from a URL; replaced by the detected format below
+    if Image is None or extension == ".svg":
+        return content, extension or ".png"
+
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            width, height = image.size
+            if width < IMAGE_MIN_DIMENSION or height < IMAGE_MIN_DIMENSION:
+                return None
+            original_extension = _FORMAT_EXTENSIONS.get(image.format)
+            if extension not in _WEB_EXTENSIONS:
+                extension = original_extension or extension or ".png"
+            if IMAGE_FORMAT == "original" or getattr(image, "is_animated", False):
+                return content, extension
+
+            image.load()
+            resized = bool(IMAGE_MAX_DIMENSION) and max(width, height) > IMAGE_MAX_DIMENSION
+            if resized:
+                image.thumbnail((IMAGE_MAX_DIMENSION, IMAGE_MAX_DIMENSION), Image.LANCZOS)
+
+            # Drawings, charts and screenshots with few colours stay sharp with lossless WebP
+            lossless = original_extension != ".jpg" and image.getcolors(maxcolors=256) is not None
+            encoded, encoded_extension = _encode(image, lossless)
+    except Exception as e:
+        logging.debug(f"Uploading an image unchanged, it could not be processed: {e}")
+        return content, extension or ".png"
+
+    # Never upload something bigger than what we started from
+    if not resized and original_extension and len(encoded) >= len(content):
+        return content, extension
+    return encoded, encoded_extension
+
+
+def upload_images(images: list, source: str, metadata: dict = None, run=None) -> tuple:
+    """
+    Normalize a batch of images and upload each distinct one once.
+
+    Identical images within the batch share one upload, and images already uploaded by an
+    earlier job (with the same settings) reuse that S3 object.
+
+    Args:
+        images (list): (content, file_extension) pairs; content may be None for a missing image.
+        source (str): S3 prefix for new uploads, e.g. 'processed_pdfs/opensource/<folder>/images'.
+        metadata (dict): Metadata tags for new uploads.
+        run (PipelineRun): Optional run receiving the uploaded bytes and skipped image counts.
+
+    Returns:
+        tuple: (urls, dropped) where urls holds the S3 URL of every image in input order (None for
+               missing, dropped or failed images) and dropped is the set of indices dropped as too small.
+    """
+    digests = [hashlib.sha256(content).hexdigest() if content is not None else None for content, _ in images]
+
+    # Step 1: One entry per distinct content
+    first_index = {}
+    for index, digest in enumerate(digests):
+        if digest is not None:
+            first_index.setdefault(digest, index)
+
+    # Step 2: Reuse the uploads of earlier jobs
+    urls_by_digest, dropped_digests = {}, set()
+    for digest in first_index:
+        cached = image_upload_cache.get(f"{digest}:{IMAGE_FINGERPRINT}")
+        if cached is not None:
+            if cached["s3_url"] is None:
+                dropped_digests.add(digest)
+            else:
+                urls_by_digest[digest] = cached["s3_url"]
+    reused = len(urls_by_digest)
+    pending = [digest for digest in first_index if digest not in urls_by_digest and digest not in dropped_digests]
+
+    # Step 3: Drop, downsize and re-encode the new images in parallel
+    prepared = dict(zip(pending, _process_executor.map(lambda digest: normalize_image(*images[first_index[digest]]), pending)))
+    for digest, result in prepared.items():
+        if result is None:
+            dropped_digests.add(digest)
+            image_upload_cache.put(f"{digest}:{IMAGE_FINGERPRINT}", {"s3_url": None})
+    to_upload = [digest for digest in pending if prepared[digest] is not None]
+
+    # Step 4: Upload them as one concurrent batch and remember where they went
+    uploaded_urls, _ = upload_many([
+        UploadItem(prepared[digest][0], source, metadata, prepared[digest][1]) for digest in to_upload
+    ])
+    for digest, url in zip(to_upload, uploaded_urls):
+        if url:
+            urls_by_digest[digest] = url
+            image_upload_cache.put(f"{digest}:{IMAGE_FINGERPRINT}", {"s3_url": url})
+
+    urls = [urls_by_digest.get(digest) if digest else None for digest in digests]
+    dropped = {index for index, digest in enumerate(digests) if digest in dropped_digests}
+    if run is not None:
+        run.add_bytes("out", sum(len(prepared[digest][0]) for digest, url in zip(to_upload, uploaded_urls) if url))
+        duplicates = sum(digest is not None for digest in digests) - len(first_index)
+        for reason, count in (("too_small", len(dropped)), ("duplicate", duplicates), ("already_uploaded", reused)):
+            if count:
+                metrics_registry.inc("pipeline_images_skipped_total", (("pipeline", run.pipeline), ("reason", reason)), count)
+    return urls, dropped
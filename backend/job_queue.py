@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from uuid import uuid4
+from pathlib import Path
+
+from backend.executors import QueueFullError
+
+# Local job store; no external broker is needed to run the queue
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+JOB_SPOOL_DIR = os.getenv("JOB_SPOOL_DIR", "job_spool")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(24 * 3600)))
+# Queued jobs accepted before submissions are refused; bounds the payloads spooled to disk
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+# Seconds a worker waits before retrying a job the conversion pool had no room for
+JOB_RETRY_SECONDS = float(os.getenv("JOB_RETRY_SECONDS", "2"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress TEXT NOT NULL DEFAULT '[]',
+    payload_path TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+class JobQueue:
+    """A SQLite-backed job queue whose jobs are executed by a local pool of worker threads."""
+
+    def __init__(self, handlers: dict, db_path: str = JOB_DB_PATH, spool_dir: str = JOB_SPOOL_DIR,
+                 workers: int = JOB_WORKERS, retention_seconds: int = JOB_RETENTION_SECONDS,
+                 max_pending: int = JOB_MAX_PENDING):
+        """
+        Args:
+            handlers (dict): Maps a job kind to a callable(payload: bytes, progress_callback) -> dict.
+                             A handler raising QueueFullError puts its job back in the queue.
+            db_path (str): Path of the SQLite database holding job state.
+            spool_dir (str): Directory where job payloads wait until a worker picks them up.
+            workers (int): Number of worker threads executing jobs.
+            retention_seconds (int): How long finished jobs stay retrievable.
+            max_pending (int): Queued jobs beyond which submit raises QueueFullError.
+        """
+        self.handlers = handlers
+        self.spool_dir = Path(spool_dir)
+        self.workers = workers
+        self.retention_seconds = retention_seconds
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stopping = threading.Event()
+        self._threads = []
+
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(_SCHEMA)
+            # Jobs interrupted by a restart go back to the queue
+            self._conn.execute("UPDATE jobs SET status = 'queued', stage = NULL WHERE status = 'running'")
+
+    def submit(self, kind: str, payload: bytes) -> str:
+        """
+        Enqueue a job.
+
+        Args:
+            kind (str): The handler to run, e.g. 'pdf' or 'pdf_enterprise'.
+            payload (bytes): Input passed to the handler.
+
+        Returns:
+            str: The ID used to poll the job.
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        with self._lock:
+            pending = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        if pending >= self.max_pending:
+            raise QueueFullError(f"The job queue is full ({pending} jobs queued)")
+
+        job_id = uuid4().hex
+        payload_path = self.spool_dir / f"{job_id}.bin"
+        payload_path.write_bytes(payload)
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload_path, created_at, updated_at) VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, str(payload_path), now, now)
+            )
+        with self._wakeup:
+            self._wakeup.notify()
+        logging.debug(f"Job {job_id} ({kind}) queued.")
+        return job_id
+
+    def get(self, job_id: str) -> dict:
+        """Return the status, progress and result of a job, or None if it does not exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "progress": json.loads(row["progress"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def stats(self) -> dict:
+        """Return the number of jobs per status."""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def _claim_next(self):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, kind, payload_path FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), row["id"])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def _record_stage(self, job_id: str, stage: str) -> None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            progress = json.loads(row["progress"]) + [{"stage": stage, "at": now}]
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?",
+                (stage, json.dumps(progress), now, job_id)
+            )
+
+    def _finish(self, job_id: str, status: str, result: dict = None, error: str = None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+            )
+
+    def _requeue(self, job_id: str) -> None:
+        # The next attempt starts over, so the stages of this one are dropped instead of repeating
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = NULL, progress = '[]', updated_at = ? WHERE id = ?",
+                (time.time(), job_id)
+            )
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?", (cutoff,)
+            )
+
+    def _run_job(self, row) -> bool:
+        """Run a claimed job; returns False when it went back to the queue for lack of capacity."""
+        job_id, payload_path = row["id"], Path(row["payload_path"])
+        logging.debug(f"Job {job_id} ({row['kind']}) started.")
+        try:
+            payload = payload_path.read_bytes()
+            result = self.handlers[row["kind"]](payload, lambda stage: self._record_stage(job_id, stage))
+            self._record_stage(job_id, "done")
+            self._finish(job_id, "succeeded", result=result)
+            logging.debug(f"Job {job_id} succeeded.")
+        except QueueFullError:
+            # The conversion pool is saturated by API requests; keep the payload and retry later
+            logging.debug(f"Job {job_id} requeued, the conversion pool is full.")
+            self._requeue(job_id)
+            return False
+        except Exception as e:
+            logging.error(f"Job {job_id} failed: {e}", exc_info=True)
+            self._finish(job_id, "failed", error=str(e))
+        if payload_path.exists():
+            os.remove(payload_path)
+        return True
+
+    def _worker_loop(self) -> None:
+        while not self._stopping.is_set():
+            row = self._claim_next()
+            if row is None:
+                self._purge_expired()
+                with self._wakeup:
+                    self._wakeup.wait(timeout=5)
+                continue
+            if not self._run_job(row):
+                self._stopping.wait(JOB_RETRY_SECONDS)
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        """Stop the worker threads after their current job; unfinished jobs resume on restart."""
+        self._stopping.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
@@ -0,0 +1,192 @@
+import time
+import threading
+from bisect import bisect_left
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+_METRICS = {
+    "pipeline_stage_duration_seconds": ("histogram", "Time spent in each stage of a pipeline run."),
+    "pipeline_duration_seconds": ("histogram", "End-to-end time of a pipeline run by outcome."),
+    "pipeline_bytes_total": ("counter", "Bytes received (in) and uploaded (out) by a pipeline."),
+    "pipeline_images_total": ("counter", "Images uploaded by a pipeline."),
+    "pipeline_images_skipped_total": ("counter", "Images not uploaded: too small, duplicate or already uploaded."),
+    "pipeline_errors_total": ("counter", "Failed pipeline runs by the stage that failed."),
+    "http_admission_wait_seconds": ("histogram", "Time requests waited for a slot of their route."),
+    "http_requests_rejected_total": ("counter", "Requests turned away: queue full, wait timeout or body too large."),
+}
+
+
+class MetricsRegistry:
+    """In-process histograms and counters rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> [bucket counts..., +Inf count, sum]
+        self._counters = {}    # (name, labels) -> value
+
+    def observe(self, name: str, labels: tuple, seconds: float) -> None:
+        bucket = bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            series = self._histograms.setdefault((name, labels), [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+            series[bucket] += 1
+            series[-1] += seconds
+
+    def inc(self, name: str, labels: tuple, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + amount
+
+    def drain(self) -> dict:
+        """Return everything recorded so far and reset, e.g. to ship it from a worker process."""
+        with self._lock:
+            snapshot = {"histograms": self._histograms, "counters": self._counters}
+            self._histograms, self._counters = {}, {}
+        return snapshot
+
+    def merge(self, snapshot: dict) -> None:
+        """Add a drained snapshot from another process into this registry."""
+        if not snapshot:
+            return
+        with self._lock:
+            for key, values in snapshot["histograms"].items():
+                series = self._histograms.setdefault(key, [0] * len(values[:-1]) + [0.0])
+                for i, value in enumerate(values):
+                    series[i] += value
+            for key, value in snapshot["counters"].items():
+                self._counters[key] = self._counters.get(key, 0) + value
+
+    def render(self) -> str:
+        """Return all series in the Prometheus text exposition format."""
+        with self._lock:
+            histograms = {key: list(values) for key, values in self._histograms.items()}
+            counters = dict(self._counters)
+
+        lines = []
+        for name, (kind, help_text) in _METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == "histogram":
+                for (series_name, labels), values in sorted(histograms.items()):
+                    if series_name != name:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), values[:-1]):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {values[-1]}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+            else:
+                for (series_name, labels), value in sorted(counters.items()):
+                    if series_name == name:
+                        lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: tuple) -> str:
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+registry = MetricsRegistry()
+
+
+class PipelineRun:
+    """
+    Times the stages of one pipeline run.
+
+    Calling stage() (or the run itself, so it can stand in for a progress_callback) ends the
+    current stage and starts the next one; finish() or fail() closes the run.
+    """
+
+    def __init__(self, pipeline: str, progress_callback=None):
+        """
+        Args:
+            pipeline (str): Pipeline label, e.g. 'pdf_opensource' or 'scrape'.
+            progress_callback (callable): Optional callable also receiving each stage name.
+        """
+        self.pipeline = pipeline
+        self.progress_callback = progress_callback
+        self.current_stage = None
+        self._started = time.perf_counter()
+        self._stage_started = self._started
+        self._closed = False
+
+    def _end_stage(self) -> None:
+        now = time.perf_counter()
+        if self.current_stage is not None:
+            registry.observe(
+                "pipeline_stage_duration_seconds",
+                (("pipeline", self.pipeline), ("stage", self.current_stage)),
+                now - self._stage_started
+            )
+        self._stage_started = now
+
+    def stage(self, name: str) -> None:
+        """End the current stage and start the named one."""
+        self._end_stage()
+        self.current_stage = name
+        if self.progress_callback:
+            self.progress_callback(name)
+
+    __call__ = stage
+
+    def add_bytes(self, direction: str, amount: int) -> None:
+        """Count bytes received ('in') or uploaded ('out')."""
+        registry.inc("pipeline_bytes_total", (("pipeline", self.pipeline), ("direction", direction)), amount)
+
+    def add_images(self, count: int) -> None:
+        registry.inc("pipeline_images_total", (("pipeline", self.pipeline),), count)
+
+    def count_bytes(self, direction: str, chunks):
+        """Pass an iterable of str/bytes chunks through while counting their size."""
+        for chunk in chunks:
+            self.add_bytes(direction, len(chunk.encode("utf-8") if isinstance(chunk, str) else chunk))
+            yield chunk
+
+    def finish(self, status: str = "success") -> None:
+        """Close the run, e.g. with status 'success' or 'cache_hit'."""
+        if self._closed:
+            return
+        self._closed = True
+        self._end_stage()
+        registry.observe(
+            "pipeline_duration_seconds", (("pipeline", self.pipeline), ("status", status)),
+            time.perf_counter() - self._started
+        )
+
+    def fail(self) -> None:
+        """Close the run as an error attributed to the stage that was running."""
+        if self._closed:
+            return
+        registry.inc(
+            "pipeline_errors_total", (("pipeline", self.pipeline), ("stage", self.current_stage or "unknown"))
+        )
+        self.finish("error")
+
+
+def observe_stage(pipeline: str, stage: str, seconds: float) -> None:
+    """Record a stage duration measured outside a PipelineRun."""
+    registry.observe("pipeline_stage_duration_seconds", (("pipeline", pipeline), ("stage", stage)), seconds)
+
+
+def call_collecting(func, *args):
+    """
+    Run func(*args) in a worker process and hand back what it recorded.
+
+    Returns:
+        tuple: (result, snapshot); on failure the snapshot travels on the exception as metrics_snapshot.
+    """
+    try:
+        result = func(*args)
+    except Exception as e:
+        e.metrics_snapshot = registry.drain()
+        raise
+    return result, registry.drain()
+
+
+def render_metrics() -> str:
+    """Return the metrics of this process in the Prometheus text format."""
+    return registry.render()
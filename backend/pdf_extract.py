@@ -1,110 +1,247 @@
 import os
+import threading
+from io import BytesIO
 from uuid import uuid4
 from datetime import datetime
 import logging
 
-from pathlib import Path
+import pypdfium2 as pdfium
 from docling_core.types.doc import ImageRefMode, PictureItem
-from docling.datamodel.base_models import InputFormat
-from docling.datamodel.pipeline_options import PdfPipelineOptions
-from docling.document_converter import DocumentConverter, PdfFormatOption
+from docling.datamodel.base_models import DocumentStream
 
-from storage.s3_utils import upload_file_to_s3  # Import S3 utilities
+try:
+    # pdfium is not thread-safe; share docling's lock so splits never overlap its own pdfium calls
+    from docling.utils.locks import pypdfium2_lock
+except ImportError:  # Older docling releases without the shared lock
+    pypdfium2_lock = threading.Lock()
 
-IMAGE_RESOLUTION_SCALE = 2.0
+from backend.converter_pool import DEFAULT_PROFILE, acquire_converter, pipeline_fingerprint
+from backend.executors import QueueFullError, cpu_bound_result, cpu_executor, io_executor, submit_cpu_bound
+from backend.image_pipeline import IMAGE_FINGERPRINT, upload_images
+from backend.metrics import PipelineRun
+from storage.result_cache import content_hash, get_result_cache
+from storage.s3_utils import upload_bytes_to_s3  # Import S3 utilities
 
+# Previously converted PDFs, keyed by content hash and pipeline options
+result_cache = get_result_cache("pdf_opensource")
 
-def process_pdf(file_content: bytes) -> dict:
+# Marks where each picture sits in the exported markdown until its S3 URL is known
+PICTURE_PLACEHOLDER = "<!-- docling-picture -->"
+
+# Pages per shard when a PDF is converted in sharded mode
+PDF_SHARD_PAGES = int(os.getenv("PDF_SHARD_PAGES", "50"))
+
+
+def split_pdf(file_content: bytes, pages_per_shard: int, max_shards: int = None) -> list:
+    """
+    Split a PDF into consecutive page ranges.
+
+    Args:
+        file_content (bytes): The content of the PDF file.
+        pages_per_shard (int): Minimum number of pages in each shard (the last one may be shorter).
+        max_shards (int): Upper bound on the number of shards; shards grow to stay within it.
+
+    Returns:
+        list: The PDF bytes of every shard in page order; the original content if it fits in one shard.
+    """
+    with pypdfium2_lock:
+        return _split_pdf(file_content, pages_per_shard, max_shards)
+
+
+def _split_pdf(file_content: bytes, pages_per_shard: int, max_shards: int) -> list:
+    source = pdfium.PdfDocument(file_content)
+    try:
+        page_count = len(source)
+        if max_shards:
+            pages_per_shard = max(pages_per_shard, -(-page_count // max_shards))
+        if page_count <= pages_per_shard:
+            return [file_content]
+
+        shards = []
+        for start in range(0, page_count, pages_per_shard):
+            shard = pdfium.PdfDocument.new()
+            try:
+                shard.import_pages(source, list(range(start, min(start + pages_per_shard, page_count))))
+                buffer = BytesIO()
+                shard.save(buffer)
+                shards.append(buffer.getvalue())
+            finally:
+                shard.close()
+        return shards
+    finally:
+        source.close()
+
+
+def render_document(document) -> tuple:
+    """
+    Export a converted document as markdown with picture placeholders, plus its pictures as PNGs.
+
+    Args:
+        document (DoclingDocument): The converted document.
+
+    Returns:
+        tuple: (markdown, picture_images) where picture_images holds one PNG per picture in
+               document order, or None for pictures docling produced no image for.
+    """
+    picture_images = []
+    for element, _level in document.iterate_items():
+        if isinstance(element, PictureItem):
+            image = element.get_image(document)
+            if image is None:
+                picture_images.append(None)
+                continue
+            buffer = BytesIO()
+            image.save(buffer, "PNG")
+            picture_images.append(buffer.getvalue())
+
+    markdown = document.export_to_markdown(image_mode=ImageRefMode.PLACEHOLDER, image_placeholder=PICTURE_PLACEHOLDER)
+    return markdown, picture_images
+
+
+def convert_shard(shard_content: bytes, profile: str = DEFAULT_PROFILE) -> tuple:
+    """
+    Convert one PDF shard with a warm converter; runs inside a conversion worker process.
+
+    Args:
+        shard_content (bytes): PDF bytes of the shard.
+        profile (str): Pipeline profile used for the conversion.
+
+    Returns:
+        tuple: The (markdown, picture_images) pair produced by render_document.
+    """
+    source = DocumentStream(name=f"shard_{uuid4().hex[:8]}.pdf", stream=BytesIO(shard_content))
+    with acquire_converter(profile) as doc_converter:
+        conv_res = doc_converter.convert(source)
+    return render_document(conv_res.document)
+
+
+def link_pictures(markdown: str, image_s3_urls: list) -> str:
+    """
+    Replace the picture placeholders of an exported document with S3 image links.
+
+    Args:
+        markdown (str): Markdown exported with PICTURE_PLACEHOLDER for every picture.
+        image_s3_urls (list): One entry per picture in document order; None for pictures without an image.
+
+    Returns:
+        str: Markdown referencing the uploaded images.
+    """
+    parts = markdown.split(PICTURE_PLACEHOLDER)
+    linked = [parts[0]]
+    for index, part in enumerate(parts[1:]):
+        image_s3_url = image_s3_urls[index] if index < len(image_s3_urls) else None
+        linked.append(f"![Image]({image_s3_url})" if image_s3_url else "")
+        linked.append(part)
+    return "".join(linked)
+
+
+def process_pdf(file_content: bytes, progress_callback=None, sharded: bool = False,
+                profile: str = DEFAULT_PROFILE) -> dict:
     """
     Process a PDF file to extract markdown content and images, and upload them to S3.
 
     Args:
         file_content (bytes): The content of the uploaded PDF file.
+        progress_callback (callable): Optional callable receiving the name of each stage as it starts.
+        sharded (bool): Split the PDF into PDF_SHARD_PAGES page ranges converted in parallel by the
+                        conversion process pool. Call it from a thread, not from a pool worker.
+                        Ignored when conversions share the I/O thread pool (PDF_PROCESS_WORKERS=0).
+        profile (str): Pipeline profile name or key from resolve_profile ('fast', 'standard', 'full').
 
     Returns:
         dict: A dictionary with S3 URLs for the markdown file, extracted images, and status information.
     """
     logging.basicConfig(level=logging.DEBUG)
+    run = PipelineRun("pdf_opensource", progress_callback)
 
     try:
         logging.debug("Starting the PDF processing function.")
+        run.add_bytes("in", len(file_content))
 
         # Step 1: Validate the PDF file
+        run.stage("validating")
         if not file_content.startswith(b"%PDF"):
             logging.error("The uploaded file is not a valid PDF.")
             raise ValueError("The provided file is not a valid PDF.")
         logging.debug("PDF file content validated.")
 
-        # Step 2: Create a unique folder name for this processing task
+        # Step 2: Return the stored S3 URLs if these exact bytes were already converted
+        run.stage("cache_lookup")
+        # The image settings are part of the key: a result links to images normalized with them
+        cache_key = content_hash(file_content, f"{pipeline_fingerprint(profile)}:{IMAGE_FINGERPRINT}")
+        cached_result = result_cache.get(cache_key)
+        if cached_result is not None:
+            logging.debug(f"Cache hit for {cache_key}; skipping conversion.")
+            run.finish("cache_hit")
+            return {**cached_result, "message": "PDF already processed; returning stored S3 URLs"}
+
+        # Step 3: Create a unique folder name for this processing task
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         unique_folder = f"pdf_{timestamp}_{uuid4().hex[:8]}"  # Unique folder name
         logging.debug(f"Unique S3 folder for this PDF: {unique_folder}")
 
-        # Step 3: Write the PDF content to a temporary file
-        temp_pdf_path = Path(f"temp_{uuid4().hex[:8]}.pdf")
-        with open(temp_pdf_path, "wb") as temp_file:
-            temp_file.write(file_content)
-        logging.debug(f"Temporary PDF saved to {temp_pdf_path}.")
-
-        # Step 4: Configure pipeline options for image extraction
-        pipeline_options = PdfPipelineOptions()
-        pipeline_options.images_scale = IMAGE_RESOLUTION_SCALE
-        pipeline_options.generate_page_images = True
-        pipeline_options.generate_picture_images = True
-        pipeline_options.do_table_structure = True
-        logging.debug(f"Pipeline options configured: {pipeline_options}")
-
-        # Step 5: Initialize DocumentConverter and convert the PDF
-        logging.debug("Initializing DocumentConverter...")
-        doc_converter = DocumentConverter(
-            format_options={
-                InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
-            }
-        )
-        conv_res = doc_converter.convert(Path(temp_pdf_path))
+        # Step 4: Convert the PDF straight from memory, either whole or as parallel page-range shards
+        run.stage("converting")
+        shards = [file_content]
+        if sharded and cpu_executor is io_executor:
+            # This thread belongs to the pool the shards would be queued on; waiting on them
+            # could deadlock a saturated pool, so convert the document whole instead
+            logging.debug("No conversion process pool; converting the PDF without sharding.")
+        elif sharded:
+            # About two shards per worker keeps every core busy without flooding the pool's queue
+            shards = split_pdf(file_content, PDF_SHARD_PAGES, max_shards=2 * cpu_executor.workers)
+        if len(shards) == 1:
+            logging.debug(f"Converting PDF with profile '{profile}'...")
+            markdown_content, picture_images = convert_shard(file_content, profile)
+        else:
+            logging.debug(f"Converting PDF as {len(shards)} page-range shards...")
+            futures = []
+            try:
+                for shard in shards:
+                    futures.append(submit_cpu_bound(convert_shard, shard, profile))
+                shard_results = [cpu_bound_result(future) for future in futures]
+            except BaseException:
+                # A full queue or a failed shard: don't leave the other shards converting for nothing
+                for future in futures:
+                    future.cancel()
+                raise
+
+            # Merge in page order; placeholders and pictures stay aligned across shards
+            markdown_content = "\n\n".join(markdown for markdown, _ in shard_results)
+            picture_images = [image for _, images in shard_results for image in images]
         logging.debug("PDF conversion completed successfully.")
 
-        # Step 6: Extract and upload images to S3
-        logging.debug("Extracting images from PDF...")
-        image_s3_urls = []
-        picture_counter = 0
-        for element, _level in conv_res.document.iterate_items():
-            if isinstance(element, PictureItem):
-                picture_counter += 1
-                temp_image_path = f"{Path(temp_pdf_path).stem}-picture-{picture_counter}.png"
-                with open(temp_image_path, "wb") as fp:
-                    element.get_image(conv_res.document).save(fp, "PNG")
-                logging.debug(f"Image saved temporarily: {temp_image_path}")
-
-                # Upload the image to S3
-                image_s3_url = upload_file_to_s3(
-                    temp_image_path,
-                    f"processed_pdfs/opensource/{unique_folder}/images",
-                    "images",
-                    metadata={
-                        "upload_timestamp": timestamp,
-                        "file_type": "image",
-                        "unique_folder": unique_folder
-                    }
-                )
-                image_s3_urls.append(image_s3_url)
-                logging.debug(f"Image uploaded to S3: {image_s3_url}")
-
-                # Clean up the temporary image file
-                os.remove(temp_image_path)
-                logging.debug(f"Temporary image file deleted: {temp_image_path}")
-
-        # Step 7: Save and upload Markdown content to S3
-        logging.debug("Saving Markdown content...")
-        temp_markdown_path = temp_pdf_path.with_suffix("").with_name(f"temp_{uuid4().hex[:8]}_with_images.md")
-        conv_res.document.save_as_markdown(temp_markdown_path, image_mode=ImageRefMode.REFERENCED)
-        logging.debug(f"Markdown content saved temporarily: {temp_markdown_path}")
+        # Step 5: Drop, dedupe and recompress the pictures, then upload them as one concurrent batch
+        run.stage("uploading_images")
+        metadata = {
+            "upload_timestamp": timestamp,
+            "file_type": "image",
+            "unique_folder": unique_folder
+        }
+        picture_s3_urls, dropped = upload_images(
+            [(image, ".png") for image in picture_images],
+            f"processed_pdfs/opensource/{unique_folder}/images",
+            metadata,
+            run
+        )
+        image_s3_urls = list(dict.fromkeys(url for url in picture_s3_urls if url))
+        failed = sum(1 for image, url in zip(picture_images, picture_s3_urls) if image is not None and url is None)
+        if failed > len(dropped):
+            logging.error(f"{failed - len(dropped)} of {len(picture_images)} images failed to upload.")
+        logging.debug(f"{len(image_s3_urls)} images uploaded to S3, {len(dropped)} too small to keep.")
+        run.add_images(len(image_s3_urls))
+
+        # Step 6: Point the Markdown at the S3 images and upload it
+        run.stage("uploading_markdown")
+        logging.debug("Linking Markdown content to the uploaded images...")
+        markdown_content = link_pictures(markdown_content, picture_s3_urls).encode("utf-8")
+        run.add_bytes("out", len(markdown_content))
 
         # Upload Markdown to S3
-        markdown_s3_url = upload_file_to_s3(
-            temp_markdown_path,
+        markdown_s3_url = upload_bytes_to_s3(
+            markdown_content,
             f"processed_pdfs/opensource/{unique_folder}/markdown",
-            "markdown",
+            ".md",
             metadata={
                 "upload_timestamp": timestamp,
                 "file_type": "markdown",
@@ -113,21 +250,24 @@ def process_pdf(file_content: bytes) -> dict:
         )
         logging.debug(f"Markdown uploaded to S3: {markdown_s3_url}")
 
-        # Step 8: Clean up temporary files
-        os.remove(temp_pdf_path)
-        os.remove(temp_markdown_path)
-        logging.debug("Temporary files cleaned up.")
-
-        # Step 9: Return success response
+        # Step 7: Remember the result and return success response
         logging.debug("PDF processing completed successfully.")
-        return {
+        result = {
             "markdown_s3_url": markdown_s3_url,
             "image_s3_urls": image_s3_urls,
             "unique_folder": unique_folder,
             "status": "success",
             "message": "PDF processed and uploaded to S3 successfully"
         }
+        result_cache.put(cache_key, result)
+        run.finish()
+        return result
 
+    except QueueFullError:
+        # Passed through unwrapped so the API answers 503 with Retry-After
+        run.fail()
+        raise
     except Exception as e:
+        run.fail()
         logging.error(f"Error processing PDF: {e}", exc_info=True)
         raise RuntimeError(f"Error processing PDF: {str(e)}")
@@ -1,105 +1,111 @@
+import io
 import os
 import json
 import logging
 import zipfile
 from uuid import uuid4
 from datetime import datetime
-from pathlib import Path
-from dotenv import load_dotenv
 
-from adobe.pdfservices.operation.auth.service_principal_credentials import ServicePrincipalCredentials
+try:
+    import ijson  # Optional: parses structuredData.json incrementally
+except ImportError:
+    ijson = None
+    logging.warning("ijson is not installed; structuredData.json will be loaded whole into memory.")
+
 from adobe.pdfservices.operation.exception.exceptions import ServiceApiException, ServiceUsageException, SdkException
-from adobe.pdfservices.operation.pdf_services_media_type import PDFServicesMediaType
-from adobe.pdfservices.operation.io.cloud_asset import CloudAsset
-from adobe.pdfservices.operation.io.stream_asset import StreamAsset
-from adobe.pdfservices.operation.pdf_services import PDFServices
-from adobe.pdfservices.operation.pdfjobs.jobs.extract_pdf_job import ExtractPDFJob
-from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_element_type import ExtractElementType
-from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_pdf_params import ExtractPDFParams
-from adobe.pdfservices.operation.pdfjobs.result.extract_pdf_result import ExtractPDFResult
-from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_renditions_element_type import ExtractRenditionsElementType
-
-from storage.s3_utils import upload_file_to_s3  # Import S3 utilities
+
+from backend.adobe_markdown import render_markdown
+from backend.adobe_client import extract_pdf, extract_pdf_async
+from backend.executors import QueueFullError, run_io_bound
+from backend.image_pipeline import IMAGE_BATCH_SIZE, IMAGE_FINGERPRINT, upload_images
+from backend.metrics import PipelineRun
+from storage.result_cache import content_hash, get_result_cache
+from storage.s3_utils import upload_stream_to_s3  # Import S3 utilities
 
 logging.basicConfig(level=logging.DEBUG)
 
-# Load environment variables
-load_dotenv()
-CLIENT_ID = os.getenv("CLIENT_ID")
-CLIENT_SECRET = os.getenv("CLIENT_SECRET")
+# Identifies the extraction settings in backend.adobe_client; bump it when they change so cached results are not reused
+EXTRACT_FINGERPRINT = "adobe-extract:text,tables:figures,tables:v2"
+
+# Previously extracted PDFs, keyed by content hash and extraction settings
+result_cache = get_result_cache("pdf_enterprise")
 
-def process_pdf_enterprise(file_content: bytes) -> dict:
+def check_cache(file_content: bytes) -> tuple:
     """
-    Process a PDF file using Adobe PDF Services to extract text, tables, and images, and upload them to S3.
-    
+    Validate a PDF and look up a previous extraction of the same bytes.
+
     Args:
         file_content (bytes): The content of the uploaded PDF file.
-    
+
+    Returns:
+        tuple: (cache_key, cached result dict or None).
+    """
+    # Validate PDF file
+    if not file_content.startswith(b"%PDF"):
+        logging.error("The uploaded file is not a valid PDF.")
+        raise ValueError("The provided file is not a valid PDF.")
+
+    # The image settings are part of the key: a result links to images normalized with them
+    cache_key = content_hash(file_content, f"{EXTRACT_FINGERPRINT}:{IMAGE_FINGERPRINT}")
+    cached_result = result_cache.get(cache_key)
+    if cached_result is not None:
+        logging.debug(f"Cache hit for {cache_key}; skipping extraction.")
+        return cache_key, {**cached_result, "message": "PDF already processed; returning stored S3 URLs"}
+    return cache_key, None
+
+
+def publish_extraction(zip_content: bytes, cache_key: str, run: PipelineRun) -> dict:
+    """
+    Convert an Adobe extract result to Markdown and upload it with its renditions to S3.
+
+    The zip is read in memory: the renditions go through the image pipeline into S3 in batches of
+    IMAGE_BATCH_SIZE, then the Markdown is rendered while structuredData.json is parsed and
+    uploaded as it is produced.
+
+    Args:
+        zip_content (bytes): The result zip returned by the extract job.
+        cache_key (str): Key under which the result is remembered.
+        run (PipelineRun): Timing of the calling pipeline run; receives the upload stages.
+
     Returns:
         dict: A dictionary containing S3 URLs for the extracted markdown, images, and processing status.
     """
-    try:
-        logging.debug("Starting PDF extraction using Adobe PDF Services.")
-        
-        # Validate PDF file
-        if not file_content.startswith(b"%PDF"):
-            logging.error("The uploaded file is not a valid PDF.")
-            raise ValueError("The provided file is not a valid PDF.")
-        
-        # Create unique folder name for S3
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_folder = f"pdf_{timestamp}_{uuid4().hex[:8]}"
-        logging.debug(f"Unique S3 folder: {unique_folder}")
-        
-        # Save PDF temporarily
-        temp_pdf_path = Path(f"temp_{uuid4().hex[:8]}.pdf")
-        with open(temp_pdf_path, "wb") as temp_file:
-            temp_file.write(file_content)
-        logging.debug(f"Temporary PDF saved at {temp_pdf_path}.")
-        
-        # Authenticate Adobe PDF Services
-        credentials = ServicePrincipalCredentials(
-            client_id=CLIENT_ID,
-            client_secret=CLIENT_SECRET
-        )
-        pdf_services = PDFServices(credentials=credentials)
-        
-        # Upload PDF
-        input_asset = pdf_services.upload(input_stream=file_content, mime_type=PDFServicesMediaType.PDF)
-        
-        # Set extraction parameters
-        extract_pdf_params = ExtractPDFParams(
-            elements_to_extract=[ExtractElementType.TEXT, ExtractElementType.TABLES],
-            elements_to_extract_renditions=[ExtractRenditionsElementType.FIGURES, ExtractRenditionsElementType.TABLES]
-        )
-        
-        # Submit extraction job
-        extract_pdf_job = ExtractPDFJob(input_asset=input_asset, extract_pdf_params=extract_pdf_params)
-        location = pdf_services.submit(extract_pdf_job)
-        pdf_services_response = pdf_services.get_job_result(location, ExtractPDFResult)
-        result_asset: CloudAsset = pdf_services_response.get_result().get_resource()
-        stream_asset: StreamAsset = pdf_services.get_content(result_asset)
-        
-        # Save extracted content as zip
-        temp_zip_path = temp_pdf_path.with_suffix(".zip")
-        with open(temp_zip_path, "wb") as zip_file:
-            zip_file.write(stream_asset.get_input_stream())
-        logging.debug(f"Extracted content saved to {temp_zip_path}.")
-        
-        # Process extracted content
-        markdown_output, image_paths = extract_content(temp_zip_path)
-        
-        # Save Markdown file
-        temp_markdown_path = temp_pdf_path.with_suffix(".md")
-        with open(temp_markdown_path, "w", encoding="utf-8") as md_file:
-            md_file.write(markdown_output)
-        logging.debug(f"Markdown content saved to {temp_markdown_path}.")
-        
-        # Upload Markdown to S3
-        markdown_s3_url = upload_file_to_s3(
-            temp_markdown_path,
+    # Create unique folder name for S3
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    unique_folder = f"pdf_{timestamp}_{uuid4().hex[:8]}"
+    logging.debug(f"Unique S3 folder: {unique_folder}")
+
+    with zipfile.ZipFile(io.BytesIO(zip_content)) as archive:
+        # Upload images to S3 straight from the archive, so the Markdown can link to them
+        run.stage("uploading_images")
+        metadata = {
+            "upload_timestamp": timestamp,
+            "file_type": "image",
+            "unique_folder": unique_folder
+        }
+        renditions = list_renditions(archive)
+        uploaded_urls, dropped = [], set()
+        for start in range(0, len(renditions), IMAGE_BATCH_SIZE):
+            # Only one batch of decompressed renditions is held in memory at a time
+            batch = renditions[start:start + IMAGE_BATCH_SIZE]
+            batch_urls, batch_dropped = upload_images(
+                [(archive.read(name), os.path.splitext(name)[1]) for name in batch],
+                f"processed_pdfs/enterprise/{unique_folder}/images",
+                metadata,
+                run
+            )
+            uploaded_urls.extend(batch_urls)
+            dropped.update(start + index for index in batch_dropped)
+        # Dropped renditions have no URL, so the Markdown leaves them out
+        rendition_urls = {name: url for name, url in zip(renditions, uploaded_urls) if url}
+        run.add_images(len(rendition_urls))
+
+        # Upload Markdown to S3 while it is rendered from the structured data
+        run.stage("uploading_markdown")
+        markdown_s3_url = upload_stream_to_s3(
+            run.count_bytes("out", extract_content(archive, rendition_urls)),
             f"processed_pdfs/enterprise/{unique_folder}/markdown",
-            "markdown",
+            ".md",
             metadata={
                 "upload_timestamp": timestamp,
                 "file_type": "markdown",
@@ -107,65 +113,113 @@ def process_pdf_enterprise(file_content: bytes) -> dict:
             }
         )
         logging.debug(f"Markdown uploaded to S3: {markdown_s3_url}")
-        
-        # Upload images to S3
-        image_s3_urls = []
-        for image_path in image_paths:
-            image_s3_url = upload_file_to_s3(
-                image_path,
-                f"processed_pdfs/enterprise/{unique_folder}/images",
-                "images",
-                metadata={
-                    "upload_timestamp": timestamp,
-                    "file_type": "image",
-                    "unique_folder": unique_folder
-                }
-            )
-            image_s3_urls.append(image_s3_url)
-            logging.debug(f"Image uploaded to S3: {image_s3_url}")
-            os.remove(image_path)
-        
-        # Clean up temporary files
-        os.remove(temp_pdf_path)
-        os.remove(temp_zip_path)
-        os.remove(temp_markdown_path)
-        logging.debug("Temporary files deleted.")
-        
-        return {
-            "markdown_s3_url": markdown_s3_url,
-            "image_s3_urls": image_s3_urls,
-            "unique_folder": unique_folder,
-            "status": "success",
-            "message": "PDF processed and uploaded to S3 successfully"
-        }
+    failed = len(renditions) - len(rendition_urls) - len(dropped)
+    if failed:
+        logging.error(f"{failed} of {len(renditions)} images failed to upload.")
+    image_s3_urls = list(dict.fromkeys(url for url in uploaded_urls if url))
+    logging.debug(f"{len(image_s3_urls)} images uploaded to S3.")
+
+    result = {
+        "markdown_s3_url": markdown_s3_url,
+        "image_s3_urls": image_s3_urls,
+        "unique_folder": unique_folder,
+        "status": "success",
+        "message": "PDF processed and uploaded to S3 successfully"
+    }
+    result_cache.put(cache_key, result)
+    return result
+
+
+def process_pdf_enterprise(file_content: bytes, progress_callback=None) -> dict:
+    """
+    Process a PDF file using Adobe PDF Services to extract text, tables, and images, and upload them to S3.
+    
+    Args:
+        file_content (bytes): The content of the uploaded PDF file.
+        progress_callback (callable): Optional callable receiving the name of each stage as it starts.
+    
+    Returns:
+        dict: A dictionary containing S3 URLs for the extracted markdown, images, and processing status.
+    """
+    run = PipelineRun("pdf_enterprise", progress_callback)
+    try:
+        logging.debug("Starting PDF extraction using Adobe PDF Services.")
+        run.add_bytes("in", len(file_content))
+
+        # Return the stored S3 URLs if these exact bytes were already extracted
+        run.stage("cache_lookup")
+        cache_key, cached_result = check_cache(file_content)
+        if cached_result is not None:
+            run.finish("cache_hit")
+            return cached_result
+
+        # Submit the extract job to the shared runner and wait for its result zip
+        run.stage("extracting")
+        zip_content = extract_pdf(file_content)
+
+        result = publish_extraction(zip_content, cache_key, run)
+        run.finish()
+        return result
     
     except (ServiceApiException, ServiceUsageException, SdkException, Exception) as e:
+        run.fail()
         logging.error(f"Error processing PDF: {e}", exc_info=True)
         raise RuntimeError(f"Error processing PDF: {str(e)}")
 
 
-def extract_content(zip_file_path) -> tuple:
-    """Extracts text, tables, and figures from the zip file and formats them as Markdown."""
-    markdown_output = []
-    image_paths = []
-    
-    with zipfile.ZipFile(zip_file_path, 'r') as archive:
-        with archive.open('structuredData.json') as json_entry:
-            data = json.load(json_entry)
-            markdown_output.append(process_text(data))
-        
-        for file in archive.namelist():
-            if file.startswith(('tables/', 'figures/')) and file.endswith(('.png', '.jpg', '.jpeg')):
-                image_data = archive.read(file)
-                image_name = os.path.basename(file)
-                temp_image_path = Path(image_name)
-                with open(temp_image_path, 'wb') as image_file:
-                    image_file.write(image_data)
-                image_paths.append(temp_image_path)
-    
-    return "\n\n".join(markdown_output), image_paths
+async def process_pdf_enterprise_async(file_content: bytes) -> dict:
+    """
+    Same as process_pdf_enterprise, but waits for the remote job without holding a thread.
+
+    Args:
+        file_content (bytes): The content of the uploaded PDF file.
+
+    Returns:
+        dict: A dictionary containing S3 URLs for the extracted markdown, images, and processing status.
+    """
+    run = PipelineRun("pdf_enterprise")
+    try:
+        logging.debug("Starting PDF extraction using Adobe PDF Services.")
+        run.add_bytes("in", len(file_content))
+        run.stage("cache_lookup")
+        cache_key, cached_result = await run_io_bound(check_cache, file_content)
+        if cached_result is not None:
+            run.finish("cache_hit")
+            return cached_result
+
+        run.stage("extracting")
+        zip_content = await extract_pdf_async(file_content)
+        result = await run_io_bound(publish_extraction, zip_content, cache_key, run)
+        run.finish()
+        return result
+
+    except QueueFullError:
+        run.fail()
+        raise
+    except (ServiceApiException, ServiceUsageException, SdkException, Exception) as e:
+        run.fail()
+        logging.error(f"Error processing PDF: {e}", exc_info=True)
+        raise RuntimeError(f"Error processing PDF: {str(e)}")
+
+
+def iter_elements(archive: zipfile.ZipFile):
+    """Yield the elements of structuredData.json one at a time, incrementally when ijson is installed."""
+    with archive.open('structuredData.json') as json_entry:
+        if ijson is not None:
+            yield from ijson.items(json_entry, "elements.item")
+        else:
+            yield from json.load(json_entry).get("elements", [])
+
+
+def extract_content(archive: zipfile.ZipFile, rendition_urls: dict = None):
+    """Yields the extracted document as structured Markdown chunks, ready to be streamed to S3."""
+    return render_markdown(iter_elements(archive), rendition_urls, archive.read)
+
 
+def list_renditions(archive: zipfile.ZipFile) -> list:
+    """Returns the names of the table and figure images in the archive."""
+    return [
+        name for name in archive.namelist()
+        if name.startswith(('tables/', 'figures/')) and name.lower().endswith(('.png', '.jpg', '.jpeg'))
+    ]
 
-def process_text(data) -> str:
-    """Processes extracted text elements and formats them as Markdown."""
-    return "\n\n".join([element["Text"] for element in data.get("elements", []) if "Text" in element])
\ No newline at end of file
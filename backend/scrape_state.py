@@ -0,0 +1,126 @@
+import re
+import difflib
+import hashlib
+import logging
+from backend import http_client
+from storage.result_cache import get_result_cache
+from storage.s3_utils import download_bytes_from_s3, upload_bytes_to_s3
+
+# Last scrape of every URL: content hashes, HTTP validators and the S3 objects it produced
+scrape_state = get_result_cache("scrape_state")
+
+PROBE_TIMEOUT = (http_client.DEFAULT_TIMEOUT[0], 15)
+
+
+def markdown_hash(markdown: str) -> str:
+    """Hash Markdown with whitespace differences (trailing spaces, blank-line runs) normalized away."""
+    normalized = re.sub(r"[ \t]+\n", "\n", markdown.strip())
+    normalized = re.sub(r"\n{3,}", "\n\n", normalized)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def load_state(scraper: str, url: str) -> dict:
+    """Return the stored state of a URL for a scraper ('opensource' or 'enterprise'), or None."""
+    return scrape_state.get(f"{scraper}:{url.strip()}")
+
+
+def save_state(scraper: str, url: str, result: dict, digest: str, validators: dict = None) -> None:
+    """
+    Remember what the latest scrape of a URL produced.
+
+    Args:
+        scraper (str): 'opensource' or 'enterprise'.
+        url (str): The requested URL.
+        result (dict): The scrape result with markdown_s3_url, image_s3_urls and unique_folder.
+        digest (str): markdown_hash of the uploaded Markdown.
+        validators (dict): Optional etag, last_modified and content_hash of the page response.
+    """
+    scrape_state.put(f"{scraper}:{url.strip()}", {
+        "result": {key: result[key] for key in ("markdown_s3_url", "image_s3_urls", "unique_folder")},
+        "markdown_hash": digest,
+        **(validators or {}),
+    })
+
+
+def unchanged_result(state: dict) -> dict:
+    """The response for a page whose content did not change since its last scrape."""
+    return {
+        **state["result"],
+        "status": "success",
+        "changed": False,
+        "message": "Page unchanged since the last scrape; returning stored S3 URLs."
+    }
+
+
+def response_validators(response) -> dict:
+    """The etag, last_modified and body hash of a page response, stored with its scrape result."""
+    return {
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "content_hash": hashlib.sha256(response.content).hexdigest(),
+    }
+
+
+def probe_page(url: str, state: dict) -> tuple:
+    """
+    Check with a conditional GET whether a page changed since the state was recorded.
+
+    Pages without a stored state (never scraped, expired, or state tracking disabled) are not
+    requested at all: the scraper fetches them anyway, so a probe would only download them twice.
+
+    Args:
+        url (str): The page URL.
+        state (dict): Its stored state, or None for a page never scraped before.
+
+    Returns:
+        tuple: (unchanged, validators) where validators holds the etag, last_modified and
+               content_hash to store with the next result.
+    """
+    if state is None:
+        return False, {}
+
+    headers = {}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    try:
+        response = http_client.get(url, headers=headers, timeout=PROBE_TIMEOUT)
+    except Exception as e:
+        print(f"Could not probe {url}: {e}")
+        return False, {}
+
+    if response.status_code == 304:
+        return True, {key: state.get(key) for key in ("etag", "last_modified", "content_hash")}
+    if response.status_code != 200:
+        return False, {}
+    validators = response_validators(response)
+    # Servers without validators: an identical body is just as good as a 304
+    unchanged = state.get("content_hash") == validators["content_hash"]
+    return unchanged, validators
+
+
+def store_diff(state: dict, markdown: str, source: str, metadata: dict) -> str:
+    """
+    Upload a unified diff between the previously uploaded Markdown and the new one.
+
+    Args:
+        state (dict): The stored state holding the previous markdown_s3_url.
+        markdown (str): The new Markdown.
+        source (str): S3 prefix for the diff, next to the new Markdown.
+        metadata (dict): Metadata tags for the object.
+
+    Returns:
+        str: S3 URL of the .diff file, or None when the previous Markdown could not be read.
+    """
+    previous_url = state["result"]["markdown_s3_url"]
+    try:
+        previous = download_bytes_from_s3(previous_url).decode("utf-8", errors="replace")
+    except Exception as e:
+        logging.error(f"Could not read the previous Markdown {previous_url} for a diff: {e}")
+        return None
+    diff = difflib.unified_diff(
+        previous.splitlines(keepends=True), markdown.splitlines(keepends=True),
+        fromfile=previous_url, tofile="current"
+    )
+    return upload_bytes_to_s3("".join(diff).encode("utf-8"), source, ".diff", metadata)
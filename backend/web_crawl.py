@@ -0,0 +1,252 @@
+import os
+import asyncio
+import posixpath
+import urllib.parse
+import urllib.robotparser
+from backend import http_client
+from backend.executors import io_executor
+from backend.metrics import PipelineRun
+from backend.scrape_state import response_validators
+from backend.web_scrape import convert_page, fetch_page
+
+# Crawl bounds used when a request does not set its own, and the hard caps on what it may ask for
+CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "2"))
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "50"))
+CRAWL_MAX_DEPTH_LIMIT = int(os.getenv("CRAWL_MAX_DEPTH_LIMIT", "5"))
+CRAWL_MAX_PAGES_LIMIT = int(os.getenv("CRAWL_MAX_PAGES_LIMIT", "500"))
+# Pages fetched and converted at the same time within one crawl
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "8"))
+# Minimum seconds between two page requests to the same host; a robots.txt Crawl-delay can raise it
+CRAWL_HOST_DELAY_SECONDS = float(os.getenv("CRAWL_HOST_DELAY_SECONDS", "0.5"))
+ROBOTS_TIMEOUT = (http_client.DEFAULT_TIMEOUT[0], 10)
+
+# Links to files that are not web pages are never queued
+SKIPPED_EXTENSIONS = {
+    ".pdf", ".zip", ".gz", ".tar", ".exe", ".dmg", ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp",
+    ".ico", ".css", ".js", ".json", ".xml", ".mp3", ".mp4", ".avi", ".mov", ".woff", ".woff2", ".ttf",
+}
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a page URL, used to recognise pages that were already queued.
+
+    Lowercases the scheme and host, drops default ports, fragments and dot segments, and
+    gives an empty path a trailing slash. Returns None for anything that is not http(s).
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    netloc = parts.hostname.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        return None
+    if port and port != _DEFAULT_PORTS[scheme]:
+        netloc = f"{netloc}:{port}"
+    path = parts.path or "/"
+    if "." in path:
+        # Resolve ./ and ../ while keeping a meaningful trailing slash
+        trailing = path.endswith("/")
+        path = posixpath.normpath(path)
+        path = path + "/" if trailing and path != "/" else path
+    return urllib.parse.urlunsplit((scheme, netloc, path, parts.query, ""))
+
+
+def extract_links(soup, base_url: str) -> list:
+    """Return the normalized http(s) page links of a parsed page in document order."""
+    links = []
+    for anchor in soup.find_all("a", href=True):
+        if "nofollow" in (anchor.get("rel") or []):
+            continue
+        url = normalize_url(urllib.parse.urljoin(base_url, anchor["href"]))
+        if url and posixpath.splitext(urllib.parse.urlsplit(url).path)[1].lower() not in SKIPPED_EXTENSIONS:
+            links.append(url)
+    return list(dict.fromkeys(links))
+
+
+def _fetch_robots(origin: str) -> urllib.robotparser.RobotFileParser:
+    """Download and parse the robots.txt of an origin such as 'https://docs.example.com'."""
+    parser = urllib.robotparser.RobotFileParser(f"{origin}/robots.txt")
+    try:
+        response = http_client.get(f"{origin}/robots.txt", timeout=ROBOTS_TIMEOUT)
+    except Exception as e:
+        # RFC 9309 2.3.1.4: an unreachable robots.txt means the site may not be crawled
+        print(f"Could not fetch {origin}/robots.txt ({e}); not crawling {origin}")
+        parser.disallow_all = True
+        return parser
+    if response.status_code >= 500:
+        parser.disallow_all = True  # Unreachable as well
+    elif response.status_code >= 400:
+        # RFC 9309 2.3.1.3: any 4xx, 401 and 403 included, makes robots.txt unavailable and allows everything
+        parser.allow_all = True
+    else:
+        parser.parse(response.text.splitlines())
+    return parser
+
+
+class SiteCrawler:
+    """
+    Breadth-first crawl of one or more sites through the open-source scrape pipeline.
+
+    A frontier queue feeds a pool of asyncio workers; every URL is normalized and queued at most
+    once, links are followed only on the seed hosts (and under url_prefix, if given), robots.txt
+    rules and Crawl-delay are respected, and requests to one host are spaced by a politeness delay.
+    Each page is converted and uploaded exactly like a /scrape-web/ page.
+    """
+
+    def __init__(self, seed_urls: list, max_depth: int = CRAWL_MAX_DEPTH, max_pages: int = CRAWL_MAX_PAGES,
+                 url_prefix: str = None, workers: int = CRAWL_WORKERS,
+                 host_delay: float = CRAWL_HOST_DELAY_SECONDS):
+        """
+        Args:
+            seed_urls (list): Pages the crawl starts from (depth 0).
+            max_depth (int): Link hops followed from a seed page.
+            max_pages (int): Pages crawled in total, seeds included.
+            url_prefix (str): Only follow links starting with this URL, e.g. 'https://example.com/docs/'.
+            workers (int): Pages processed at the same time.
+            host_delay (float): Minimum seconds between two page requests to the same host.
+        """
+        self.max_depth = max(0, min(max_depth, CRAWL_MAX_DEPTH_LIMIT))
+        self.max_pages = max(1, min(max_pages, CRAWL_MAX_PAGES_LIMIT))
+        self.url_prefix = normalize_url(url_prefix) if url_prefix else None
+        self.workers = max(1, workers)
+        self.host_delay = host_delay
+        self.seed_urls = [url for url in dict.fromkeys(map(normalize_url, seed_urls)) if url]
+        self.hosts = {urllib.parse.urlsplit(url).netloc for url in self.seed_urls}
+        self._seen = set()
+        self._robots = {}        # origin -> task resolving to a RobotFileParser
+        self._host_locks = {}    # host -> asyncio.Lock serialising the politeness wait
+        self._next_request = {}  # host -> loop time of the next allowed request
+
+    def _in_scope(self, url: str) -> bool:
+        if urllib.parse.urlsplit(url).netloc not in self.hosts:
+            return False
+        return self.url_prefix is None or url.startswith(self.url_prefix)
+
+    async def _robots_for(self, url: str) -> urllib.robotparser.RobotFileParser:
+        parts = urllib.parse.urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        if origin not in self._robots:
+            # One fetch per origin, shared by every worker that needs it meanwhile
+            self._robots[origin] = asyncio.ensure_future(io_executor.run(_fetch_robots, origin))
+        return await self._robots[origin]
+
+    async def _allowed(self, url: str) -> bool:
+        return (await self._robots_for(url)).can_fetch(http_client.USER_AGENT, url)
+
+    async def _wait_for_turn(self, url: str) -> None:
+        """Sleep until the politeness delay since the last request to this host has passed."""
+        host = urllib.parse.urlsplit(url).netloc
+        robots = await self._robots_for(url)
+        delay = max(self.host_delay, float(robots.crawl_delay(http_client.USER_AGENT) or 0))
+        loop = asyncio.get_running_loop()
+        async with self._host_locks.setdefault(host, asyncio.Lock()):
+            wait = self._next_request.get(host, 0) - loop.time()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_request[host] = loop.time() + delay
+
+    def _admit(self, url: str) -> bool:
+        """Claim a URL for the frontier unless it was seen before or the page budget is spent."""
+        if url in self._seen or len(self._seen) >= self.max_pages:
+            return False
+        self._seen.add(url)
+        return True
+
+    async def _crawl_page(self, url: str, depth: int, frontier: asyncio.Queue) -> tuple:
+        run = PipelineRun("crawl")
+        try:
+            # Step 1: Respect robots.txt and the per-host politeness delay
+            run.stage("waiting")
+            if not await self._allowed(url):
+                raise PermissionError(f"Disallowed by robots.txt: {url}")
+            await self._wait_for_turn(url)
+
+            # Step 2: Fetch and parse the page, skipping responses that are not HTML or were redirected
+            # off the crawl scope; a seed redirected to another host (e.g. to www.) brings that host in
+            response, soup = await io_executor.run(fetch_page, url, run)
+            content_type = response.headers.get("Content-Type", "text/html")
+            if "html" not in content_type:
+                raise ValueError(f"Not an HTML page ({content_type}): {url}")
+            if depth == 0:
+                self.hosts.add(urllib.parse.urlsplit(response.url).netloc)
+            if response.url != url and not self._in_scope(response.url):
+                raise ValueError(f"Redirected out of the crawl scope: {url} -> {response.url}")
+
+            # Step 3: Queue the in-scope links before the page is rewritten for conversion; relative
+            # links resolve against the URL the page was served from after redirects
+            if depth < self.max_depth:
+                for link in extract_links(soup, response.url):
+                    if self._in_scope(link) and link not in self._seen and await self._allowed(link):
+                        if self._admit(link):
+                            frontier.put_nowait((link, depth + 1))
+
+            # Step 4: Rehost the images and upload the Markdown like any scraped page
+            result = await io_executor.run(
+                convert_page, url, soup, run, response_validators(response), False, response.url
+            )
+            return url, {**result, "depth": depth}
+        except Exception as e:
+            run.fail()
+            print(f"Error crawling {url}: {e}")
+            return url, {"error": str(e), "depth": depth}
+
+    async def crawl(self):
+        """
+        Run the crawl.
+
+        Yields:
+            tuple: (url, result) in completion order; result is the scrape_and_convert dictionary
+            plus the page's link depth, or {"error": ..., "depth": ...} for pages that failed.
+        """
+        frontier = asyncio.Queue()
+        results = asyncio.Queue()
+        for url in self.seed_urls:
+            if self._admit(url):
+                frontier.put_nowait((url, 0))
+
+        async def worker() -> None:
+            while True:
+                url, depth = await frontier.get()
+                try:
+                    await results.put(await self._crawl_page(url, depth, frontier))
+                finally:
+                    frontier.task_done()
+
+        async def close_when_idle() -> None:
+            # The frontier is done once every queued page, including the links it added, was processed
+            await frontier.join()
+            await results.put(None)
+
+        tasks = [asyncio.create_task(worker()) for _ in range(self.workers)]
+        tasks.append(asyncio.create_task(close_when_idle()))
+        try:
+            while (item := await results.get()) is not None:
+                yield item
+        finally:
+            # Also reached when the caller stops early, e.g. a streaming client went away
+            for task in tasks:
+                task.cancel()
+            for robots in self._robots.values():
+                robots.cancel()
+        print(f"Crawled {len(self._seen)} pages from {len(self.seed_urls)} seed URLs")
+
+
+def crawl_site(seed_urls: list, **options) -> dict:
+    """
+    Crawl sites to completion and return every page's result.
+
+    Args:
+        seed_urls (list): Pages the crawl starts from.
+        **options: SiteCrawler options (max_depth, max_pages, url_prefix, workers, host_delay).
+
+    Returns:
+        dict: Maps each crawled URL to its result, in completion order.
+    """
+    async def collect() -> dict:
+        return {url: result async for url, result in SiteCrawler(seed_urls, **options).crawl()}
+
+    return asyncio.run(collect())
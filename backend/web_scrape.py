@@ -1,127 +1,266 @@
 import os
+import time
+import functools
 import requests
 from bs4 import BeautifulSoup
-from markitdown import MarkItDown
 from uuid import uuid4
 from datetime import datetime
-from storage.s3_utils import upload_file_to_s3  # Import S3 utilities
+from concurrent.futures import ThreadPoolExecutor, wait
+from backend import http_client
+from backend.http_cache import cached_get
+from backend.image_pipeline import upload_images
+from backend.metrics import PipelineRun
+from backend.scrape_state import (
+    load_state, markdown_hash, response_validators, save_state, store_diff, unchanged_result
+)
+from storage.s3_utils import upload_bytes_to_s3  # Import S3 utilities
 
+try:
+    # MarkItDown's own HTML converter, applied to the tree we already parsed. It is a private
+    # module, so markitdown is pinned in requirements.txt to the version this was tested with
+    from markitdown.converters._markdownify import _CustomMarkdownify as _MarkdownConverter
+except ImportError:
+    from markdownify import MarkdownConverter as _MarkdownConverter
 
-def scrape_and_convert(url: str) -> dict:
+# Image stage limits: total parallel downloads, (connect, read) timeout per image and a
+# deadline for all images of one page; per-host limits live in backend.http_client
+IMAGE_WORKERS = int(os.getenv("SCRAPE_IMAGE_WORKERS", "16"))
+IMAGE_TIMEOUT = (http_client.DEFAULT_TIMEOUT[0], float(os.getenv("SCRAPE_IMAGE_TIMEOUT", "15")))
+PAGE_IMAGE_DEADLINE = float(os.getenv("SCRAPE_PAGE_IMAGE_DEADLINE", "60"))
+
+# BeautifulSoup tree builder for scraped pages; 'lxml' parses several times faster when installed
+SCRAPE_HTML_PARSER = os.getenv("SCRAPE_HTML_PARSER", "html.parser")
+
+_image_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="scrape-image")
+
+# One converter for every page; it keeps no per-document state
+_markdown_converter = _MarkdownConverter(heading_style="atx")
+
+
+def html_parser() -> str:
+    """Return SCRAPE_HTML_PARSER, falling back to html.parser when lxml is not installed."""
+    if SCRAPE_HTML_PARSER == "lxml":
+        try:
+            import lxml  # noqa: F401
+        except ImportError:
+            print("SCRAPE_HTML_PARSER=lxml but lxml is not installed; using html.parser")
+            return "html.parser"
+    return SCRAPE_HTML_PARSER
+
+
+def html_to_markdown(soup: BeautifulSoup) -> str:
     """
-    Scrapes a web page, extracts images, and converts content to Markdown, storing everything on S3.
+    Convert a parsed page to Markdown the way MarkItDown does, without serializing and re-parsing it.
 
     Args:
-        url (str): The URL of the web page to scrape.
+        soup (BeautifulSoup): The page; script and style elements are removed from it.
 
     Returns:
-        dict: A dictionary with S3 URLs for the Markdown file and extracted images.
+        str: The Markdown of the page body.
     """
+    for element in soup(["script", "style"]):
+        element.extract()
+    root = soup.find("body") or soup
     try:
-        # Step 1: Generate a unique folder for this URL
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        return _markdown_converter.convert_soup(root).strip()
+    except RecursionError:
+        # Very deeply nested pages exceed markdownify's recursion limit; keep the text at least
+        return root.get_text("\n", strip=True)
+
+
+def _fetch_image(img_url: str, deadline: float) -> bytes:
+    """
+    Download one image, waiting for a free slot on its host until the page deadline.
+
+    Args:
+        img_url (str): Absolute URL of the image.
+        deadline (float): time.monotonic() value after which the download is abandoned.
+
+    Returns:
+        bytes: The image content.
+    """
+    fetch = functools.partial(http_client.get, deadline=deadline)
+    return cached_get(img_url, timeout=IMAGE_TIMEOUT, get=fetch).content
+
+
+def fetch_page(url: str, run: PipelineRun) -> tuple:
+    """
+    Fetch a web page through the HTTP cache and parse it.
+
+    Args:
+        url (str): The URL of the web page.
+        run (PipelineRun): The run the fetch is timed and counted in.
+
+    Returns:
+        tuple: (response, soup) with the CachedResponse and the parsed BeautifulSoup tree.
+    """
+    run.stage("fetching")
+    response = cached_get(url)
+    run.add_bytes("in", len(response.content))
+    soup = BeautifulSoup(response.text, html_parser())
+    print(f"Scraping content from {url}")
+    return response, soup
+
+
+def convert_page(url: str, soup: BeautifulSoup, run: PipelineRun, validators: dict = None,
+                 store_diff_file: bool = False, base_url: str = None) -> dict:
+    """
+    Rehost the images of a fetched page on S3 and upload the page as Markdown.
+
+    Pages scraped before are compared with their last result: an unchanged page returns the
+    stored S3 URLs without uploading anything, and a changed one is uploaded to the same folder.
+
+    Args:
+        url (str): The URL the page was requested from; its scrape state is kept under it.
+        soup (BeautifulSoup): The parsed page; image sources are rewritten to their S3 URLs.
+        run (PipelineRun): The run the stages are timed in; finished on success.
+        validators (dict): response_validators of the fetched page; a body identical to the one of the
+                           last successful scrape returns its stored result.
+        store_diff_file (bool): Upload a unified diff against the previous Markdown next to the new one.
+        base_url (str): The URL the page was served from after redirects, used to resolve image
+                        sources; defaults to url.
+
+    Returns:
+        dict: A dictionary with S3 URLs for the Markdown file and extracted images.
+    """
+    # Step 1: Return the last result if the page did not change, else reuse its folder
+    # Compared with what the last successful scrape saw, not the last fetch: a scrape that failed
+    # after fetching a new version must not make the next one look unchanged
+    state = load_state("opensource", url)
+    if state is not None and validators and state.get("content_hash") == validators["content_hash"]:
+        print(f"{url} is unchanged since the last scrape")
+        run.finish("unchanged")
+        return unchanged_result(state)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if state is not None:
+        unique_folder = state["result"]["unique_folder"]
+    else:
         unique_folder = f"web_{timestamp}_{uuid4().hex[:8]}"  # Unique folder name
 
-        # Step 2: Fetch the web page
-        response = requests.get(url)
-        response.raise_for_status()
-        soup = BeautifulSoup(response.text, "html.parser")
-        print(f"Scraping content from {url}")
-
-        # Step 3: Extract images and upload them to S3
-        image_s3_urls = []
-        for img in soup.find_all("img"):
-            src = img.get("src")
-            if src:
-                # Resolve the absolute URL of the image
-                img_url = requests.compat.urljoin(url, src)
-
-                # Extract the image file name
-                img_name = os.path.basename(img_url)
-                if not img_name:  # Handle cases where the path is empty
-                    img_name = f"image_{uuid4().hex[:8]}.png"
-
-                # Download the image
-                try:
-                    img_response = requests.get(img_url)
-                    img_response.raise_for_status()
-
-                    # Save the image temporarily
-                    temp_image_path = f"temp_{uuid4().hex[:8]}_{img_name}"
-                    with open(temp_image_path, "wb") as temp_file:
-                        temp_file.write(img_response.content)
-
-                    # Upload the image to S3
-                    print(f"Uploading {img_name} to S3...")
-                    image_s3_url = upload_file_to_s3(
-                        temp_image_path,
-                        f"scraped_websites/opensource/{unique_folder}/images",
-                        "images",
-                        metadata={
-                            "original_url": url,
-                            "upload_timestamp": timestamp,
-                            "file_type": "image",
-                            "unique_folder": unique_folder
-                        }
-                    )
-                    image_s3_urls.append(image_s3_url)
-
-                    # Update the image src in the HTML to the S3 URL
-                    img["src"] = image_s3_url
-
-                    # Clean up the temporary file
-                    os.remove(temp_image_path)
-                except Exception as e:
-                    print(f"Failed to process image {img_url}: {e}")
-
-        # Step 4: Convert the HTML to Markdown
-        md = MarkItDown()
-        temp_html_path = f"temp_{uuid4().hex[:8]}.html"
-        temp_markdown_path = f"{uuid4().hex[:8]}.md"
+    # Step 2: Download images concurrently, then upload them to S3 as one batch
+    run.stage("downloading_images")
+    deadline = time.monotonic() + PAGE_IMAGE_DEADLINE
+    pending_images = []
+    for img in soup.find_all("img"):
+        src = img.get("src")
+        if src:
+            # Resolve the absolute URL of the image
+            img_url = requests.compat.urljoin(base_url or url, src)
+
+            # Extract the image file name
+            img_name = os.path.basename(img_url)
+            if not img_name:  # Handle cases where the path is empty
+                img_name = f"image_{uuid4().hex[:8]}.png"
+
+            future = _image_executor.submit(_fetch_image, img_url, deadline)
+            pending_images.append((img, img_url, img_name, future))
+
+    wait([future for *_, future in pending_images], timeout=max(0.0, deadline - time.monotonic()))
+
+    downloaded_images = []
+    for img, img_url, img_name, future in pending_images:
+        if not future.done():
+            future.cancel()
+            print(f"Failed to process image {img_url}: page image deadline exceeded")
+            continue
         try:
-            # Save the HTML to a temporary file for conversion
-            with open(temp_html_path, "w", encoding="utf-8") as temp_file:
-                temp_file.write(str(soup))
-            print(f"HTML content saved temporarily to {temp_html_path}")
-
-            # Convert the HTML to Markdown
-            result = md.convert(temp_html_path)
-            markdown_content = result.text_content
-
-            # Save the Markdown content temporarily
-            with open(temp_markdown_path, "w", encoding="utf-8") as temp_file:
-                temp_file.write(markdown_content)
-            print(f"Markdown content saved temporarily to {temp_markdown_path}")
-
-            # Upload the Markdown file to S3
-            print(f"Uploading Markdown to S3...")
-            markdown_s3_url = upload_file_to_s3(
-                temp_markdown_path,
-                f"scraped_websites/opensource/{unique_folder}/markdown",
-                "markdown",
-                metadata={
-                    "original_url": url,
-                    "upload_timestamp": timestamp,
-                    "file_type": "markdown",
-                    "unique_folder": unique_folder
-                }
-            )
-        finally:
-            # Clean up temporary files
-            if os.path.exists(temp_html_path):
-                os.remove(temp_html_path)
-            if os.path.exists(temp_markdown_path):
-                os.remove(temp_markdown_path)
-
-        # Step 5: Return the S3 URLs
-        return {
-            "markdown_s3_url": markdown_s3_url,
-            "image_s3_urls": image_s3_urls,
-            "unique_folder": unique_folder,
-            "status": "success",
-            "message": "Webpage scraped and uploaded to S3 successfully."
-        }
+            downloaded_images.append((img, img_url, img_name, future.result()))
+        except Exception as e:
+            print(f"Failed to process image {img_url}: {e}")
+
+    run.add_bytes("in", sum(len(content) for *_, content in downloaded_images))
+
+    # Drop tracking pixels, dedupe and recompress; images seen before reuse their S3 copy
+    run.stage("uploading_images")
+    print(f"Uploading {len(downloaded_images)} images to S3...")
+    metadata = {
+        "original_url": url,
+        "upload_timestamp": timestamp,
+        "file_type": "image",
+        "unique_folder": unique_folder
+    }
+    image_urls, dropped = upload_images(
+        [(content, os.path.splitext(img_name)[1]) for _, _, img_name, content in downloaded_images],
+        f"scraped_websites/opensource/{unique_folder}/images",
+        metadata,
+        run
+    )
 
+    # Update the image src in the HTML to the S3 URL, keeping document order
+    image_s3_urls = []
+    for index, ((img, img_url, _, _), image_s3_url) in enumerate(zip(downloaded_images, image_urls)):
+        if index in dropped:
+            img.decompose()  # Tracking pixels and spacers have no place in the Markdown
+            continue
+        if image_s3_url is None:
+            print(f"Failed to upload image {img_url}")
+            continue
+        if image_s3_url not in image_s3_urls:
+            image_s3_urls.append(image_s3_url)
+        img["src"] = image_s3_url
+    run.add_images(len(image_s3_urls))
+
+    # Step 3: Convert the parsed page to Markdown in memory
+    run.stage("converting")
+    markdown = html_to_markdown(soup)
+    digest = markdown_hash(markdown)
+    if state is not None and state["markdown_hash"] == digest:
+        # Same text and the same images (their S3 URLs are content-addressed): nothing to upload
+        print(f"{url} is unchanged since the last scrape")
+        save_state("opensource", url, state["result"], digest, validators)  # Restarts the entry's expiry
+        run.finish("unchanged")
+        return unchanged_result(state)
+
+    # Upload the Markdown to S3
+    print(f"Uploading Markdown to S3...")
+    run.stage("uploading_markdown")
+    markdown_content = markdown.encode("utf-8")
+    run.add_bytes("out", len(markdown_content))
+    metadata = {
+        "original_url": url,
+        "upload_timestamp": timestamp,
+        "file_type": "markdown",
+        "unique_folder": unique_folder
+    }
+    markdown_s3_url = upload_bytes_to_s3(
+        markdown_content, f"scraped_websites/opensource/{unique_folder}/markdown", ".md", metadata=metadata
+    )
+    result = {
+        "markdown_s3_url": markdown_s3_url,
+        "image_s3_urls": image_s3_urls,
+        "unique_folder": unique_folder,
+        "status": "success",
+        "changed": True,
+        "message": "Webpage scraped and uploaded to S3 successfully."
+    }
+    if store_diff_file and state is not None:
+        result["diff_s3_url"] = store_diff(
+            state, markdown, f"scraped_websites/opensource/{unique_folder}/diffs", {**metadata, "file_type": "diff"}
+        )
+
+    # Step 4: Remember the result and return the S3 URLs
+    save_state("opensource", url, result, digest, validators)
+    run.finish()
+    return result
+
+
+def scrape_and_convert(url: str, store_diff_file: bool = False) -> dict:
+    """
+    Scrapes a web page, extracts images, and converts content to Markdown, storing everything on S3.
+
+    Args:
+        url (str): The URL of the web page to scrape.
+        store_diff_file (bool): For a changed page, also upload a diff against its previous Markdown.
+
+    Returns:
+        dict: A dictionary with S3 URLs for the Markdown file and extracted images; changed is
+              False when the page was unchanged and the stored URLs are returned.
+    """
+    run = PipelineRun("scrape")
+    try:
+        response, soup = fetch_page(url, run)
+        return convert_page(url, soup, run, response_validators(response), store_diff_file, response.url)
     except Exception as e:
+        run.fail()
         print(f"Error scraping webpage: {e}")
         raise RuntimeError(f"Error scraping webpage: {str(e)}")
@@ -1,34 +1,37 @@
-from apify_client import ApifyClient
+from apify_client import ApifyClientAsync
 import os
-import requests
+import re
 import json
+import time
+import asyncio
 from dotenv import load_dotenv,dotenv_values
 from bs4 import BeautifulSoup
 import urllib.parse
 import hashlib
 from datetime import datetime
 from uuid import uuid4
-from storage.s3_utils import upload_file_to_s3
+from backend import http_client
+from backend.executors import io_executor
+from backend.image_pipeline import upload_images
+from backend.metrics import PipelineRun, observe_stage
+from backend.scrape_state import load_state, markdown_hash, probe_page, save_state, store_diff, unchanged_result
+from storage.s3_utils import upload_bytes_to_s3
 
-def scrape_and_convert_enterprise(url):
-    """
-    This function takes url as an input and uses apify client to scrape
-    the webpage and converts the output to markdown format and the images
-    present in the webpage are downloaded to images folder
-    """
-    # Load environment variables from .env file
-    load_dotenv()
-    
-
-    
-    # Initialize the ApifyClient with your API token
-    apify_client_token = os.getenv('APIFY_TOKEN')
-    client = ApifyClient(apify_client_token)
-
-    # Define the input for the Actor
-    run_input = {
-    "startUrls": [{"url": url}],
-    "maxCrawlPages": 1,
+# Load environment variables from .env file
+load_dotenv()
+
+APIFY_ACTOR_ID = "apify/website-content-crawler"
+# Seconds between run status / dataset polls, and dataset items fetched per poll
+APIFY_POLL_SECONDS = float(os.getenv("APIFY_POLL_SECONDS", "2"))
+APIFY_PAGE_SIZE = int(os.getenv("APIFY_PAGE_SIZE", "100"))
+APIFY_TERMINAL_STATUSES = ("SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT")
+
+
+def _build_run_input(urls: list) -> dict:
+    """Actor input crawling exactly the given pages, all in one run."""
+    return {
+    "startUrls": [{"url": url} for url in urls],
+    "maxCrawlPages": len(urls),
     "maxCrawlDepth": 0,
     "saveHtml": True,
     "saveMarkdown": True,
@@ -53,86 +56,299 @@ def scrape_and_convert_enterprise(url):
         ]
     }
 }
-    # Run the Actor and wait for it to finish
-    run = client.actor("apify/website-content-crawler").call(run_input=run_input)
 
-    # Unique folder name
+
+def _normalize_url(url: str) -> str:
+    # The crawler may report a page with a different case, trailing slash or fragment
+    parts = urllib.parse.urlsplit(url.strip())
+    return urllib.parse.urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip("/"), parts.query, "")
+    )
+
+
+def _match_requested_url(item: dict, pending_urls: dict) -> str:
+    """Return (and remove) the requested URL a dataset item belongs to, or None."""
+    candidates = [
+        item.get("url"),
+        (item.get("crawl") or {}).get("loadedUrl"),
+        (item.get("metadata") or {}).get("canonicalUrl"),
+    ]
+    for candidate in candidates:
+        if candidate and _normalize_url(candidate) in pending_urls:
+            return pending_urls.pop(_normalize_url(candidate))
+    if len(pending_urls) == 1:
+        # Redirected to a URL we cannot recognise, but only one page is still outstanding
+        return pending_urls.popitem()[1]
+    return None
+
+
+def process_item(item: dict, url: str = None, validators: dict = None, store_diff_file: bool = False) -> dict:
+    """
+    Rehost the images of one crawled page on S3 and upload its markdown.
+
+    Args:
+        item (dict): A website-content-crawler dataset item with url, html and markdown.
+        url (str): The requested URL the item answers; defaults to the item's own URL.
+        validators (dict): HTTP validators from probe_page, stored for the next scrape.
+        store_diff_file (bool): For a changed page, also upload a diff against its previous Markdown.
+
+    Returns:
+        dict: A dictionary with S3 URLs for the Markdown file and the page images.
+    """
+    run = PipelineRun("scrape_enterprise")
+    try:
+        return _process_item(item, run, url or item["url"], validators, store_diff_file)
+    except Exception:
+        run.fail()
+        raise
+
+
+def _process_item(item: dict, run: PipelineRun, requested_url: str, validators: dict, store_diff_file: bool) -> dict:
+    # Unique folder name, kept across re-scrapes of the same URL
+    state = load_state("enterprise", requested_url)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    unique_folder = f"enterprise_{timestamp}_{uuid4().hex[:8]}"
+    if state is not None:
+        unique_folder = state["result"]["unique_folder"]
+    else:
+        unique_folder = f"enterprise_{timestamp}_{uuid4().hex[:8]}"
 
     # Extract images and upload them to S3
     image_s3_urls = []
 
-    # Fetch and process the results
-    for item in client.dataset(run["defaultDatasetId"]).iterate_items():
-        url = item["url"]
-        markdown_content = item["markdown"]
-
-        html_content = item["html"]
-        soup = BeautifulSoup(html_content,'html.parser')
-        images = soup.find_all('img')
-
-        # Download images and update markdown content
-        for img in images:
-            img_url = img.get('src')
-            if img_url:
-                original_url = img_url
-                if not img_url.startswith(('http://', 'https://')):
-                    img_url = urllib.parse.urljoin(url, img_url)
-                try:
-                    img_filename = os.path.basename(img_url)
-                    img_path = f"temp_{uuid4().hex[:8]}_{img_filename}"
-                    response = requests.get(img_url, timeout=10)
-                    if response.status_code == 200:
-                        with open(img_path, "wb") as f:
-                            f.write(response.content)
-                        print(f"Downloaded: {img_url}")
-                    
-                        print(f"uploading {img_filename} to S3...")
-                        image_s3_url = upload_file_to_s3(img_path,
-                                                     f"scraped_websites/enterprise/{unique_folder}/images",
-                                                     "images",
-                                                     metadata={
-                                                         "original_url" : url,
-                                                         "upload_timestamp": timestamp,
-                                                         "file_type" : "image",
-                                                         "unique_folder": unique_folder
-                                                     })
-                    
-                        image_s3_urls.append(image_s3_url)
-                        # Update markdown content to reference local image
-                        markdown_content = markdown_content.replace(original_url, image_s3_url)
-                        markdown_content = markdown_content.replace(img_url, image_s3_url)
-                        os.remove(img_path)
-
-                except Exception as e:
-                    print(f"Error Downloading {img_url}:{str(e)}")
-
-        # Write markdown content to file
-        markdown_file_path = f"{uuid4().hex[:8]}.md"
-        with open(markdown_file_path, "w", encoding="utf-8") as f:
-            f.write(markdown_content)
-        print(f"Markdown content saved temporarily to {markdown_file_path}")
-
-        #Uploading the markdown file to S3
-        markdown_s3_url = upload_file_to_s3(
-            markdown_file_path,
-            f"scraped_websites/enterprise/{unique_folder}/markdown",
-            "markdown",
-            metadata={
-                "original_url": url,
-                "upload_timestamp": timestamp,
-                "file_type": "markdown",
-                "unique_folder": unique_folder
-            }
+    url = item["url"]
+    markdown_content = item["markdown"]
+
+    html_content = item["html"]
+    run.add_bytes("in", len(html_content.encode("utf-8")))
+    soup = BeautifulSoup(html_content,'html.parser')
+    images = soup.find_all('img')
+
+    # Download images
+    run.stage("downloading_images")
+    downloaded_images = []
+    for img in images:
+        img_url = img.get('src')
+        if img_url:
+            original_url = img_url
+            if not img_url.startswith(('http://', 'https://')):
+                img_url = urllib.parse.urljoin(url, img_url)
+            try:
+                img_filename = os.path.basename(img_url)
+                response = http_client.get(img_url, timeout=(5, 10))
+                if response.status_code == 200:
+                    print(f"Downloaded: {img_url}")
+                    downloaded_images.append((original_url, img_url, img_filename, response.content))
+
+            except Exception as e:
+                print(f"Error Downloading {img_url}:{str(e)}")
+
+    # Drop tracking pixels, dedupe and recompress, then upload the images as one concurrent batch
+    run.stage("uploading_images")
+    run.add_bytes("in", sum(len(content) for *_, content in downloaded_images))
+    print(f"uploading {len(downloaded_images)} images to S3...")
+    uploaded_urls, dropped = upload_images(
+        [(content, os.path.splitext(img_filename)[1]) for _, _, img_filename, content in downloaded_images],
+        f"scraped_websites/enterprise/{unique_folder}/images",
+        {
+            "original_url" : url,
+            "upload_timestamp": timestamp,
+            "file_type" : "image",
+            "unique_folder": unique_folder
+        },
+        run
+    )
+
+    # Update markdown content to reference the S3 images
+    for index, ((original_url, img_url, _, content), image_s3_url) in enumerate(zip(downloaded_images, uploaded_urls)):
+        if index in dropped:
+            # Remove the Markdown image of a tracking pixel or spacer
+            for src in (original_url, img_url):
+                markdown_content = re.sub(rf"!\[[^\]]*\]\({re.escape(src)}[^)]*\)", "", markdown_content)
+            continue
+        if image_s3_url is None:
+            print(f"Error Uploading {img_url}")
+            continue
+        if image_s3_url not in image_s3_urls:
+            image_s3_urls.append(image_s3_url)
+            run.add_images(1)
+        markdown_content = markdown_content.replace(original_url, image_s3_url)
+        markdown_content = markdown_content.replace(img_url, image_s3_url)
+
+    # Skip the upload when the page renders to the same Markdown as last time
+    digest = markdown_hash(markdown_content)
+    if state is not None and state["markdown_hash"] == digest:
+        print(f"{requested_url} is unchanged since the last scrape")
+        save_state("enterprise", requested_url, state["result"], digest, validators)
+        run.finish("unchanged")
+        return unchanged_result(state)
+
+    #Uploading the markdown straight from memory to S3
+    run.stage("uploading_markdown")
+    metadata = {
+        "original_url": url,
+        "upload_timestamp": timestamp,
+        "file_type": "markdown",
+        "unique_folder": unique_folder
+    }
+    markdown_bytes = markdown_content.encode("utf-8")
+    run.add_bytes("out", len(markdown_bytes))
+    markdown_s3_url = upload_bytes_to_s3(
+        markdown_bytes, f"scraped_websites/enterprise/{unique_folder}/markdown", ".md", metadata=metadata
+    )
+    result = {
+        "markdown_s3_url" : markdown_s3_url,
+        "image_s3_urls": image_s3_urls,
+        "unique_folder": unique_folder,
+        "status": "success",
+        "changed": True,
+        "message": "Webpage scraped and uploaded to S3 successfully."
+    }
+    if store_diff_file and state is not None:
+        result["diff_s3_url"] = store_diff(
+            state, markdown_content, f"scraped_websites/enterprise/{unique_folder}/diffs",
+            {**metadata, "file_type": "diff"}
         )
-        os.remove(markdown_file_path)
-        return {
-            "markdown_s3_url" : markdown_s3_url,
-            "image_s3_urls": image_s3_urls,
-            "unique_folder": unique_folder,
-            "status": "success",
-            "message": "Webpage scraped and uploaded to S3 successfully."
-        }
-        
+    save_state("enterprise", requested_url, result, digest, validators)
+    run.finish()
+    return result
+
+
+def _probe(url: str) -> tuple:
+    """Return (unchanged_result or None, validators) for a URL about to be sent to the crawler."""
+    # None for new URLs and when the result cache is disabled; probe_page then skips the request
+    state = load_state("enterprise", url)
+    unchanged, validators = probe_page(url, state)
+    if unchanged:
+        save_state("enterprise", url, state["result"], state["markdown_hash"], validators)
+        return unchanged_result(state), validators
+    return None, validators
 
+
+async def iter_scrape_enterprise(urls: list, store_diff_file: bool = False):
+    """
+    Crawl all URLs in a single actor run and process pages while the crawler is still running.
+
+    URLs scraped before are first checked with a conditional GET; pages the server reports as
+    unchanged are answered from their stored result and never sent to the (billed) crawler.
+
+    Args:
+        urls (list): The URLs to scrape.
+        store_diff_file (bool): For changed pages, also upload a diff against their previous Markdown.
+
+    Yields:
+        tuple: (url, result) in completion order; result is the process_item dictionary
+        or {"error": ...} for pages that failed or that the crawler did not return.
+    """
+    urls = list(dict.fromkeys(urls))
+
+    # Step 0: Answer unchanged pages from their stored result
+    validators = {}
+    probes = await asyncio.gather(*(io_executor.run(_probe, url) for url in urls))
+    for url, (result, url_validators) in zip(urls, probes):
+        validators[url] = url_validators
+        if result is not None:
+            print(f"{url} is unchanged since the last scrape")
+            yield url, result
+    urls = [url for url, (result, _) in zip(urls, probes) if result is None]
+    if not urls:
+        return
+    client = ApifyClientAsync(os.getenv('APIFY_TOKEN'))
+
+    # Step 1: Start the actor without waiting for it to finish; apify_client 3.x returns Run models
+    crawl_started = time.perf_counter()
+    run = await client.actor(APIFY_ACTOR_ID).start(run_input=_build_run_input(urls))
+    run_client = client.run(run.id)
+    dataset_client = client.dataset(run.default_dataset_id)
+    print(f"Started crawler run {run.id} for {len(urls)} URLs")
+
+    async def process(url: str, item: dict) -> tuple:
+        try:
+            return url, await io_executor.run(process_item, item, url, validators[url], store_diff_file)
+        except Exception as e:
+            return url, {"error": str(e)}
+
+    pending_urls = {_normalize_url(url): url for url in urls}
+    tasks = set()
+    offset = 0
+    finished = False
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            # Step 2: Read the status first, so items written before a terminal status are not missed
+            run = await run_client.get() or run  # None only if the run vanished; keep the last known state
+            finished = run.status in APIFY_TERMINAL_STATUSES
+
+            # Step 3: Hand every new dataset item to the I/O pool as soon as it appears
+            while True:
+                page = await dataset_client.list_items(offset=offset, limit=APIFY_PAGE_SIZE, clean=True)
+                offset += len(page.items)
+                for item in page.items:
+                    url = _match_requested_url(item, pending_urls)
+                    if url is None:
+                        print(f"Skipping crawler item for unrequested URL {item.get('url')}")
+                        continue
+                    tasks.add(asyncio.create_task(process(url, item)))
+                if len(page.items) < APIFY_PAGE_SIZE:
+                    break
+
+            if finished or not pending_urls and not tasks:
+                break
+
+            # Step 4: Yield finished pages until the next poll is due
+            next_poll = loop.time() + APIFY_POLL_SECONDS
+            while tasks and loop.time() < next_poll:
+                done, tasks = await asyncio.wait(
+                    tasks, timeout=next_poll - loop.time(), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield task.result()
+            await asyncio.sleep(max(0.0, next_poll - loop.time()))
+
+        if finished:
+            observe_stage("scrape_enterprise", "crawling", time.perf_counter() - crawl_started)
+
+        # Step 5: Drain the remaining pages, then report the URLs the crawler did not return
+        for task in asyncio.as_completed(tasks):
+            yield await task
+        for url in pending_urls.values():
+            yield url, {"error": f"Crawler run {run.status} without a result for {url}"}
+    finally:
+        for task in tasks:
+            task.cancel()
+        if not finished:
+            # Stop the run once nothing more is needed from it, e.g. when the caller went away
+            try:
+                await run_client.abort()
+            except Exception as e:
+                print(f"Error aborting crawler run {run.id}: {str(e)}")
+
+
+async def _collect(urls: list, store_diff_file: bool = False) -> dict:
+    return {url: result async for url, result in iter_scrape_enterprise(urls, store_diff_file)}
+
+
+def scrape_and_convert_enterprise_batch(urls: list, store_diff_file: bool = False) -> dict:
+    """
+    Scrape several URLs with one actor run from synchronous code.
+
+    Args:
+        urls (list): The URLs to scrape.
+        store_diff_file (bool): For changed pages, also upload a diff against their previous Markdown.
+
+    Returns:
+        dict: Maps each URL to its result or {"error": ...}, in request order.
+    """
+    results = asyncio.run(_collect(urls, store_diff_file))
+    return {url: results[url] for url in dict.fromkeys(urls)}
+
+
+def scrape_and_convert_enterprise(url):
+    """
+    This function takes url as an input and uses apify client to scrape
+    the webpage and converts the output to markdown format and the images
+    present in the webpage are uploaded to S3
+    """
+    result = scrape_and_convert_enterprise_batch([url])[url]
+    if "error" in result:
+        raise RuntimeError(f"Error scraping {url}: {result['error']}")
+    return result
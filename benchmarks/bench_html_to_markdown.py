@@ -0,0 +1,91 @@
+"""
+Benchmark HTML-to-Markdown conversion of scraped pages: the old temp-file MarkItDown round trip
+against the single-parse html_to_markdown path, with each available BeautifulSoup parser.
+
+Usage:
+    python -m benchmarks.bench_html_to_markdown --pages 200 --sections 50
+
+Prints CPU milliseconds per page; every path starts from the downloaded HTML text.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+
+from bs4 import BeautifulSoup
+
+from backend.web_scrape import html_to_markdown
+
+
+def synthetic_page(sections: int, seed: int = 0) -> str:
+    """Build an article-like page with headings, paragraphs, links, lists, tables and images."""
+    rng = random.Random(seed)
+    parts = ["<html><head><title>Benchmark</title><style>p { margin: 0 }</style></head><body><nav><ul>"]
+    parts += [f'<li><a href="/nav/{i}">Menu {i}</a></li>' for i in range(10)]
+    parts.append("</ul></nav><article>")
+    for section in range(sections):
+        parts.append(f"<h2>Section {section}</h2>")
+        for _ in range(rng.randint(1, 4)):
+            sentence = 'Lorem ipsum <b>dolor</b> sit amet, <a href="/page">consectetur</a>. '
+            parts.append(f"<p>{sentence * rng.randint(2, 10)}</p>")
+        if rng.random() < 0.3:
+            parts.append("<ul>" + "".join(f"<li>Item {i}</li>" for i in range(rng.randint(2, 8))) + "</ul>")
+        if rng.random() < 0.2:
+            rows = "".join(f"<tr><td>{r}</td><td>{r * 2}</td><td>{r * 3}</td></tr>" for r in range(rng.randint(2, 10)))
+            parts.append(f"<table><tr><th>a</th><th>b</th><th>c</th></tr>{rows}</table>")
+        if rng.random() < 0.3:
+            parts.append(f'<img src="https://bucket.s3.amazonaws.com/img{section}.png" alt="Figure {section}">')
+    parts.append("<script>window.analytics = {};</script></article></body></html>")
+    return "".join(parts)
+
+
+def temp_file_markitdown(html: str, parser: str) -> str:
+    """The previous path: parse, serialize to a temp file, let a new MarkItDown re-parse it."""
+    from markitdown import MarkItDown
+
+    soup = BeautifulSoup(html, parser)
+    with tempfile.NamedTemporaryFile("w", suffix=".html", encoding="utf-8", delete=False) as temp_file:
+        temp_file.write(str(soup))
+    try:
+        return MarkItDown().convert(temp_file.name).text_content
+    finally:
+        os.remove(temp_file.name)
+
+
+def single_parse(html: str, parser: str) -> str:
+    return html_to_markdown(BeautifulSoup(html, parser))
+
+
+def bench(convert, pages: list, parser: str) -> dict:
+    convert(pages[0], parser)  # Warm-up: imports and converter setup
+    start = time.process_time()
+    size = sum(len(convert(html, parser)) for html in pages)
+    elapsed = time.process_time() - start
+    return {"cpu_ms_per_page": round(elapsed * 1000 / len(pages), 2), "markdown_bytes": size}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--sections", type=int, default=40, help="Sections per page")
+    args = parser.parse_args()
+
+    pages = [synthetic_page(args.sections, seed) for seed in range(args.pages)]
+    parsers = ["html.parser"]
+    try:
+        import lxml  # noqa: F401
+        parsers.append("lxml")
+    except ImportError:
+        print("lxml is not installed; skipping the lxml parser.")
+
+    print(f"{args.pages} pages of {sum(map(len, pages)) // args.pages} bytes")
+    for name, convert in (("temp file + MarkItDown", temp_file_markitdown), ("single parse", single_parse)):
+        for html_parser in parsers:
+            result = bench(convert, pages, html_parser)
+            print(f"{name:>24}  {html_parser:>11}  {result['cpu_ms_per_page']:>8} ms/page  "
+                  f"{result['markdown_bytes']:>10} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark the Adobe structuredData.json Markdown renderer on synthetic documents.
+
+Usage:
+    python -m benchmarks.bench_render_markdown --sizes 10000 100000 300000
+
+Prints elements/second for each size; a linear renderer keeps that rate roughly constant.
+"""
+import time
+import random
+import argparse
+
+from backend.adobe_markdown import render_markdown
+
+
+def synthetic_elements(count: int, seed: int = 0):
+    """Yield a realistic mix of headings, paragraphs, lists, tables and figures."""
+    rng = random.Random(seed)
+    emitted = section = 0
+    while emitted < count:
+        section += 1
+        kind = rng.random()
+        if kind < 0.1:
+            yield {"Path": f"//Document/H{rng.randint(1, 3)}[{section}]", "Text": f"Section {section}"}
+            emitted += 1
+        elif kind < 0.6:
+            yield {"Path": f"//Document/P[{section}]", "Text": "Lorem ipsum dolor sit amet " * rng.randint(1, 8)}
+            emitted += 1
+        elif kind < 0.8:
+            for item in range(1, rng.randint(2, 6)):
+                yield {"Path": f"//Document/L[{section}]/LI[{item}]/Lbl", "Text": f"{item}."}
+                yield {"Path": f"//Document/L[{section}]/LI[{item}]/LBody", "Text": f"List item {item}"}
+                emitted += 2
+        elif kind < 0.95:
+            table = f"//Document/Table[{section}]"
+            yield {"Path": table, "filePaths": [f"tables/fileoutpart{section}.png"]}
+            emitted += 1
+            for row in range(1, rng.randint(3, 20)):
+                for col in range(1, 5):
+                    yield {"Path": f"{table}/TR[{row}]/TD[{col}]/P", "Text": f"r{row}c{col}"}
+                    emitted += 1
+        else:
+            yield {"Path": f"//Document/Figure[{section}]", "filePaths": [f"figures/fileoutpart{section}.png"]}
+            emitted += 1
+
+
+def bench(count: int) -> dict:
+    elements = list(synthetic_elements(count))
+    rendition_urls = {
+        path: f"https://bucket.s3.amazonaws.com/{path}"
+        for element in elements for path in element.get("filePaths", [])
+    }
+    start = time.perf_counter()
+    size = sum(len(chunk) for chunk in render_markdown(iter(elements), rendition_urls))
+    elapsed = time.perf_counter() - start
+    return {
+        "elements": len(elements),
+        "seconds": round(elapsed, 3),
+        "elements_per_second": round(len(elements) / elapsed),
+        "markdown_bytes": size,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 300_000])
+    args = parser.parse_args()
+
+    results = [bench(count) for count in args.sizes]
+    for result in results:
+        print(f"{result['elements']:>9} elements  {result['seconds']:>7}s  "
+              f"{result['elements_per_second']:>9} elements/s  {result['markdown_bytes']:>11} bytes")
+    baseline = results[0]["elements_per_second"]
+    print(f"Throughput at the largest size is {results[-1]['elements_per_second'] / baseline:.2f}x the smallest "
+          f"(close to 1.0 means linear).")
+
+
+if __name__ == "__main__":
+    main()
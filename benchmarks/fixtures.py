@@ -0,0 +1,132 @@
+"""
+Deterministic inputs and local stand-ins for the benchmark suite: generated PDFs, PNGs and Adobe
+extract zips, a static HTTP server serving canned pages, and an in-process S3 (moto).
+"""
+import io
+import os
+import json
+import zlib
+import struct
+import random
+import zipfile
+import tempfile
+import threading
+import functools
+import http.server
+from contextlib import contextmanager
+
+BENCH_BUCKET = "benchmark-bucket"
+
+
+def make_png(width: int, height: int, seed: int = 0) -> bytes:
+    """Encode a noisy RGB image as PNG with the standard library only."""
+    rng = random.Random(seed)
+    row_bytes = bytes(rng.getrandbits(8) for _ in range(width * 3))
+    raw = b"".join(b"\x00" + row_bytes[y % 7:] + row_bytes[:y % 7] for y in range(height))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+def make_pdf(pages: int, seed: int = 0, lines_per_page: int = 40) -> bytes:
+    """Write a text-only PDF with a heading and paragraphs on every page."""
+    rng = random.Random(seed)
+    words = ["latency", "throughput", "markdown", "docling", "pipeline", "storage", "bucket", "image",
+             "table", "figure", "extract", "convert", "benchmark", "report", "quarter", "revenue"]
+
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_ids = []
+    for page in range(pages):
+        lines = [f"BT /F1 18 Tf 72 740 Td (Section {page + 1}) Tj ET"]
+        for line in range(lines_per_page):
+            text = " ".join(rng.choice(words) for _ in range(12))
+            lines.append(f"BT /F1 10 Tf 72 {710 - line * 16} Td ({text}) Tj ET")
+        stream = "\n".join(lines).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Resources << /Font << /F1 3 0 R >> >> "
+            b"/Contents %d 0 R >>" % content_id
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_adobe_zip(elements: int, figures: int, seed: int = 0) -> bytes:
+    """Build an Adobe extract result zip with structuredData.json and PNG renditions."""
+    from benchmarks.bench_render_markdown import synthetic_elements
+
+    data = {"elements": list(synthetic_elements(elements, seed))}
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("structuredData.json", json.dumps(data))
+        for figure in range(figures):
+            archive.writestr(f"figures/fileoutpart{figure}.png", make_png(64, 64, seed + figure))
+    return buffer.getvalue()
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+@contextmanager
+def static_site(pages: int, images_per_page: int, image_size: int = 128):
+    """
+    Serve generated HTML pages with images from a local threaded HTTP server.
+
+    Yields:
+        list: The URLs of the pages.
+    """
+    with tempfile.TemporaryDirectory(prefix="bench_site_") as root:
+        for image in range(images_per_page * pages):
+            with open(os.path.join(root, f"img{image}.png"), "wb") as f:
+                f.write(make_png(image_size, image_size, image))
+        for page in range(pages):
+            images = "".join(
+                f'<p>Figure {image}</p><img src="img{page * images_per_page + image}.png">'
+                for image in range(images_per_page)
+            )
+            body = "".join(f"<h2>Section {section}</h2><p>{'Lorem ipsum dolor sit amet. ' * 20}</p>" for section in range(10))
+            with open(os.path.join(root, f"page{page}.html"), "w", encoding="utf-8") as f:
+                f.write(f"<html><head><title>Page {page}</title></head><body><h1>Page {page}</h1>{body}{images}</body></html>")
+
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=root))
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            yield [f"http://127.0.0.1:{server.server_port}/page{page}.html" for page in range(pages)]
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+@contextmanager
+def local_s3():
+    """Route every boto3 call of this process to an in-memory S3 with the benchmark bucket."""
+    try:
+        from moto import mock_aws
+    except ImportError as e:
+        raise RuntimeError("The benchmarks need moto for the local S3 stand-in: pip install moto") from e
+
+    with mock_aws():
+        import boto3
+        boto3.client("s3", region_name=os.environ["AWS_DEFAULT_REGION"]).create_bucket(Bucket=BENCH_BUCKET)
+        yield
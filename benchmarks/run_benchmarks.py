@@ -0,0 +1,248 @@
+"""
+Benchmark the PDF and web pipelines against local stand-ins and write a JSON report.
+
+Every workload runs in a fresh process inside a temporary working directory, with S3 served
+in-memory by moto, web pages served by a local HTTP server, Adobe PDF Services replaced by its
+stub and the result/HTTP caches disabled, so runs are reproducible and comparable.
+
+Usage:
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --workloads scrape extract_content --repeat 5
+
+Compare two reports with any JSON diff tool, e.g. `diff <(jq . old.json) <(jq . new.json)`.
+"""
+import io
+import os
+import math
+import sys
+import json
+import time
+import zipfile
+import argparse
+import platform
+import tempfile
+import subprocess
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fixtures import BENCH_BUCKET, local_s3, make_adobe_zip, make_pdf, static_site
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+WORKLOADS = ("extract_content", "pdf", "scrape", "api")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_ENV = {
+    "AWS_ACCESS_KEY_ID": "benchmark",
+    "AWS_SECRET_ACCESS_KEY": "benchmark",
+    "AWS_DEFAULT_REGION": "us-east-1",
+    "RESULT_CACHE_ENABLED": "false",
+    "HTTP_CACHE_ENABLED": "false",
+    "ADOBE_PDF_SERVICES_STUB": "true",
+    "ADOBE_STUB_LATENCY_SECONDS": "0.2",
+    "ADOBE_POLL_INITIAL_SECONDS": "0.05",
+    "WARM_UP_PROFILES": "",
+    # Conversions stay in the benchmark process, where the in-memory S3 is active; spawned
+    # workers would not see moto and would upload to real S3 with the ambient credentials
+    "PDF_PROCESS_WORKERS": "0",
+}
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure(calls: list, concurrency: int = 1) -> dict:
+    """
+    Run (callable, pages) pairs with the given concurrency and summarise their latency.
+
+    Returns:
+        dict: docs, wall time, docs/sec, p50/p95/max latency in seconds, and pages and pages/sec
+              when the inputs have pages.
+    """
+    def timed(call) -> float:
+        func, _ = call
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, calls))
+    wall = time.perf_counter() - start
+    pages = sum(pages for _, pages in calls)
+    summary = {
+        "docs": len(calls),
+        "concurrency": concurrency,
+        "wall_seconds": round(wall, 4),
+        "docs_per_second": round(len(calls) / wall, 3),
+        "latency_p50_seconds": round(percentile(latencies, 0.50), 4),
+        "latency_p95_seconds": round(percentile(latencies, 0.95), 4),
+        "latency_max_seconds": round(max(latencies), 4),
+    }
+    if pages:
+        summary.update(pages=pages, pages_per_second=round(pages / wall, 3))
+    return summary
+
+
+def bench_extract_content(args) -> dict:
+    from backend.pdf_extract_enterprise import extract_content
+
+    zips = [make_adobe_zip(size, figures=10, seed=size) for size in args.elements]
+
+    def render(content: bytes):
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            return "".join(extract_content(archive, {}))
+
+    calls = [(lambda content=content: render(content), 0) for content in zips for _ in range(args.repeat)]
+    render(zips[0])  # Warm-up
+    return {**measure(calls), "elements": args.elements}
+
+
+def bench_pdf(args) -> dict:
+    from backend.converter_pool import warm_up
+    from backend.pdf_extract import process_pdf
+
+    warm_up([args.profile])  # Model loading is startup cost, not per-document latency
+    corpus = [(make_pdf(pages, seed=pages), pages) for pages in args.pdf_pages]
+    calls = [
+        (lambda content=content: process_pdf(content, None, False, args.profile), pages)
+        for content, pages in corpus for _ in range(args.repeat)
+    ]
+    return {**measure(calls, args.concurrency), "profile": args.profile, "pdf_pages": args.pdf_pages}
+
+
+def bench_scrape(args) -> dict:
+    from backend.web_scrape import scrape_and_convert
+
+    with static_site(args.scrape_pages, args.images_per_page) as urls:
+        scrape_and_convert(urls[0])  # Warm-up: connection pools, parsers
+        calls = [(lambda url=url: scrape_and_convert(url), 1) for url in urls for _ in range(args.repeat)]
+        return {**measure(calls, args.concurrency), "images_per_page": args.images_per_page}
+
+
+def bench_api(args) -> dict:
+    from fastapi.testclient import TestClient
+    from api.fastapi_backend import app
+
+    results = {}
+    with TestClient(app) as client, static_site(args.scrape_pages, args.images_per_page) as urls:
+        def post(path: str, **kwargs):
+            response = client.post(path, **kwargs)
+            response.raise_for_status()
+
+        pdf = make_pdf(args.pdf_pages[0], seed=1)
+        endpoints = {
+            "scrape_web": (lambda: post("/scrape-web/", json={"urls": urls}), len(urls)),
+            "process_pdf_enterprise": (
+                lambda: post("/process-pdf/enterprise", files={"file": ("bench.pdf", pdf, "application/pdf")}),
+                args.pdf_pages[0],
+            ),
+            "process_pdf": (
+                lambda: post("/process-pdf/", params={"profile": args.profile},
+                             files={"file": ("bench.pdf", pdf, "application/pdf")}),
+                args.pdf_pages[0],
+            ),
+        }
+        for name, (call, pages) in endpoints.items():
+            try:
+                call()  # Warm-up
+                results[name] = measure([(call, pages)] * args.repeat, args.concurrency)
+            except Exception as e:
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+    return results
+
+
+def peak_rss_mb() -> dict:
+    """
+    Peak resident set size in MB of this process and of its largest finished child.
+
+    The two are maxima of different processes, so they are reported separately, not summed.
+    """
+    if resource is None:
+        return None
+    # Linux reports kilobytes, macOS bytes
+    unit = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / unit, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / unit, 1),
+    }
+
+
+def run_workload(name: str, args) -> dict:
+    """Run one workload; executed in a fresh spawned process."""
+    os.environ.update(BENCH_ENV)
+    os.environ["S3_BUCKET_NAME"] = BENCH_BUCKET
+    sys.path.insert(0, REPO_ROOT)
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_") as workdir:
+        os.chdir(workdir)  # Job queue, caches and temp files stay out of the repository
+        try:
+            with local_s3():
+                result = globals()[f"bench_{name}"](args)
+        except ImportError as e:
+            return {"skipped": f"missing dependency: {e}"}
+        except Exception as e:
+            # Report the failure as text; some exceptions cannot be pickled back to the parent
+            return {"error": f"{type(e).__name__}: {e}"}
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--repeat", type=int, default=3, help="Runs of every input")
+    parser.add_argument("--concurrency", type=int, default=1, help="Inputs processed at the same time")
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[1, 10, 50], help="Page counts of the PDF corpus")
+    parser.add_argument("--profile", default="fast", help="Pipeline profile for the open-source PDF pipeline")
+    parser.add_argument("--elements", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="structuredData.json element counts for extract_content")
+    parser.add_argument("--scrape-pages", type=int, default=10)
+    parser.add_argument("--images-per-page", type=int, default=8)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "meta": {
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": vars(args),
+        },
+        "workloads": {},
+    }
+
+    context = multiprocessing.get_context("spawn")
+    for name in args.workloads:
+        print(f"Running {name}...", file=sys.stderr)
+        with context.Pool(1) as pool:
+            report["workloads"][name] = pool.apply(run_workload, (name, args))
+        print(json.dumps(report["workloads"][name], sort_keys=True), file=sys.stderr)
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import json
 import streamlit as st
 import requests
 
@@ -19,6 +20,11 @@ if service in ["Open Source","Enterprise"]:
         st.write(f"You are using the {service} service for PDF processing.")
         st.subheader("Process a PDF")
 
+        # Pipeline profile (open source only): fast skips OCR, tables and images
+        profile = "full"
+        if service == "Open Source":
+            profile = st.selectbox("Pipeline profile:", ["full", "standard", "fast"])
+
         # File uploader
         uploaded_file = st.file_uploader("Choose a PDF file", type="pdf")
 
@@ -30,7 +36,7 @@ if service in ["Open Source","Enterprise"]:
 
             status_code = 0
             if service =="Open Source":
-                response = requests.post(f"{BASE_URL}/process-pdf/", files=files)
+                response = requests.post(f"{BASE_URL}/process-pdf/", files=files, params={"profile": profile})
                 status_code = response.status_code
             else:
                 response = requests.post(f"{BASE_URL}/process-pdf/enterprise", files=files)
@@ -50,29 +56,40 @@ if service in ["Open Source","Enterprise"]:
         st.header("Scrape Web")
         urls = st.text_area("Enter URLs (one per line)")
 
+        # Crawl mode (open source only): follow links from the entered pages within their sites
+        crawl = False
+        if service == "Open Source":
+            crawl = st.checkbox("Crawl linked pages on the same site")
+            if crawl:
+                max_depth = st.number_input("Maximum link depth", min_value=0, max_value=5, value=2)
+                max_pages = st.number_input("Maximum pages", min_value=1, max_value=500, value=50)
 
         if st.button("Scrape"):
             url_list = urls.strip().split("\n")
             if url_list:
                 st.write("Scraping URLs...")
-                status_code = 0
-                if service == "Open Source":
-                    response = requests.post(f"{BASE_URL}/scrape-web/", json = {"urls":url_list})
-                    status_code = response.status_code
-                else:
-                    response = requests.post(f"{BASE_URL}/scrape-web/enterprise", json = {"urls":url_list})
-                    status_code = response.status_code
-
-                if status_code==200:
-                    results = response.json()["markdown_results"]
+                endpoint = "/scrape-web/" if service == "Open Source" else "/scrape-web/enterprise"
+                payload = {"urls": url_list}
+                if crawl:
+                    endpoint = "/crawl-web/"
+                    payload.update(max_depth=int(max_depth), max_pages=int(max_pages))
 
-                    for url,result in results.items():
-                        st.subheader(url)
-                        st.success("Markdown file generated!")
-                        st.code(f"File path: {result['markdown_s3_url']}",language="bash")
-                        
-                else:
-                    st.error("Failed to scrape URLs!")
+                # Results arrive as NDJSON lines, one per URL, as soon as each URL is done
+                with requests.post(f"{BASE_URL}{endpoint}", json=payload,
+                                   params={"stream": "true"}, stream=True) as response:
+                    if response.status_code == 200:
+                        for line in response.iter_lines():
+                            if not line:
+                                continue
+                            result = json.loads(line)
+                            st.subheader(result["url"])
+                            if "error" in result:
+                                st.error(f"Failed to scrape URL! Error: {result['error']}")
+                            else:
+                                st.success("Markdown file generated!")
+                                st.code(f"File path: {result['markdown_s3_url']}",language="bash")
+                    else:
+                        st.error("Failed to scrape URLs!")
             else:
                 st.warning("Please enter at least one URL.")
 
@@ -0,0 +1,166 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_DB_PATH = os.getenv("RESULT_CACHE_DB_PATH", "result_cache.db")
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+
+_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS cache_entries (
+        namespace TEXT NOT NULL,
+        key TEXT NOT NULL,
+        value TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        last_access REAL NOT NULL,
+        PRIMARY KEY (namespace, key)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS cache_entries_lru ON cache_entries (namespace, last_access)",
+    """
+    CREATE TABLE IF NOT EXISTS cache_stats (
+        namespace TEXT PRIMARY KEY,
+        hits INTEGER NOT NULL DEFAULT 0,
+        misses INTEGER NOT NULL DEFAULT 0,
+        evictions INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+
+def content_hash(data: bytes, *fingerprint: str) -> str:
+    """
+    Build a content-addressed cache key.
+
+    Args:
+        data (bytes): The raw content, e.g. the uploaded PDF bytes.
+        *fingerprint (str): Anything else that changes the output, e.g. pipeline options.
+
+    Returns:
+        str: A SHA-256 hex digest of the content followed by the fingerprint parts.
+    """
+    return ":".join([hashlib.sha256(data).hexdigest(), *fingerprint])
+
+
+class ResultCache:
+    """A local SQLite index of previous results with TTL expiry and LRU eviction."""
+
+    def __init__(self, namespace: str, db_path: str = RESULT_CACHE_DB_PATH,
+                 ttl_seconds: int = RESULT_CACHE_TTL_SECONDS, max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 enabled: bool = RESULT_CACHE_ENABLED):
+        """
+        Args:
+            namespace (str): Separates the entries of different pipelines sharing one database.
+            db_path (str): Path of the SQLite database.
+            ttl_seconds (int): Entries older than this are treated as misses and removed.
+            max_entries (int): Least recently used entries beyond this count are evicted.
+            enabled (bool): When False, get() always misses and put() does nothing.
+        """
+        self.namespace = namespace
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily so importing a backend never touches the disk
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            for statement in _SCHEMA:
+                self._conn.execute(statement)
+            self._conn.execute("INSERT OR IGNORE INTO cache_stats (namespace) VALUES (?)", (self.namespace,))
+        return self._conn
+
+    def _count(self, conn: sqlite3.Connection, column: str, amount: int = 1) -> None:
+        conn.execute(f"UPDATE cache_stats SET {column} = {column} + ? WHERE namespace = ?", (amount, self.namespace))
+
+    def get(self, key: str) -> dict:
+        """Return the cached value for key, or None on a miss or an expired entry."""
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+                self._count(conn, "misses")
+                return None
+            conn.execute(
+                "UPDATE cache_entries SET last_access = ? WHERE namespace = ? AND key = ?", (now, self.namespace, key)
+            )
+            self._count(conn, "hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict) -> None:
+        """Store value under key and evict the least recently used entries above max_entries."""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), now, now)
+            )
+            evicted = conn.execute(
+                """
+                DELETE FROM cache_entries WHERE namespace = ? AND key IN (
+                    SELECT key FROM cache_entries WHERE namespace = ?
+                    ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.namespace, self.namespace, self.max_entries)
+            ).rowcount
+            if evicted:
+                self._count(conn, "evictions", evicted)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters (aggregated across processes) and the number of live entries."""
+        with self._lock:
+            conn = self._connection()
+            hits, misses, evictions = conn.execute(
+                "SELECT hits, misses, evictions FROM cache_stats WHERE namespace = ?", (self.namespace,)
+            ).fetchone()
+            entries = conn.execute(
+                "SELECT COUNT(*) FROM cache_entries WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+        lookups = hits + misses
+        return {
+            "enabled": self.enabled,
+            "entries": entries,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+        }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_result_cache(namespace: str) -> ResultCache:
+    """Return the process-wide cache for a namespace."""
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = ResultCache(namespace)
+        return _caches[namespace]
@@ -1,5 +1,10 @@
-import boto3
+import io
 import os
+import logging
+import threading
+import mimetypes
+from typing import NamedTuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from uuid import uuid4
 
@@ -8,16 +13,78 @@ from dotenv import load_dotenv
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize the S3 client
-s3_client = boto3.client(
-    "s3",
-    aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
-    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
-    region_name=os.getenv("AWS_DEFAULT_REGION"),
-)
+# Connections shared by every upload thread; botocore's default of 10 throttles batch uploads
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "50"))
+S3_UPLOAD_WORKERS = int(os.getenv("S3_UPLOAD_WORKERS", "16"))
+
+_upload_executor = ThreadPoolExecutor(max_workers=S3_UPLOAD_WORKERS, thread_name_prefix="s3-upload")
 
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME")
 
+# Multipart transfer settings; objects above the threshold are uploaded in parallel chunks
+MB = 1024 * 1024
+S3_MULTIPART_THRESHOLD = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8")) * MB
+S3_MULTIPART_CHUNKSIZE = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", "8")) * MB
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "10"))
+
+_s3_client = None
+_transfer_config = None
+_s3_client_lock = threading.Lock()
+
+
+def get_s3_client():
+    """
+    Return the process-wide S3 client, creating it on first use.
+
+    boto3 is imported here rather than at module load, so importing this module (and every
+    pipeline that uploads) costs nothing until the first object is actually sent to S3.
+    """
+    global _s3_client
+    with _s3_client_lock:
+        if _s3_client is None:
+            import boto3
+            from botocore.config import Config
+
+            _s3_client = boto3.client(
+                "s3",
+                aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+                aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+                region_name=os.getenv("AWS_DEFAULT_REGION"),
+                config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS, retries={"mode": "adaptive"}),
+            )
+        return _s3_client
+
+
+def get_transfer_config():
+    """Return the multipart TransferConfig shared by every upload, creating it on first use."""
+    global _transfer_config
+    with _s3_client_lock:
+        if _transfer_config is None:
+            from boto3.s3.transfer import TransferConfig
+
+            _transfer_config = TransferConfig(
+                multipart_threshold=S3_MULTIPART_THRESHOLD,
+                multipart_chunksize=S3_MULTIPART_CHUNKSIZE,
+                max_concurrency=S3_MAX_CONCURRENCY,
+                use_threads=True,
+            )
+        return _transfer_config
+
+# Folder used for each file extension under the source prefix
+EXTENSION_TO_TYPE = {
+    ".md": "markdown",
+    ".txt": "text",
+    ".png": "images",
+    ".jpg": "images",
+    ".jpeg": "images",
+    ".webp": "images",
+    ".gif": "images",
+    ".svg": "images",
+    ".pdf": "pdfs",
+    ".html": "html",
+    ".diff": "diffs"
+}
+
 def generate_s3_object_key(source: str, file_type: str, file_extension: str) -> str:
     """
     Generate a structured S3 object key (path).
@@ -53,30 +120,170 @@ def upload_file_to_s3(file_path: str, source: str, file_type: str, metadata: dic
     file_extension = os.path.splitext(file_path)[1].lower()
 
     # Determine file type based on the extension
-    extension_to_type = {
-        ".md": "markdown",
-        ".txt": "text",
-        ".png": "images",
-        ".jpg": "images",
-        ".jpeg": "images",
-        ".pdf": "pdfs",
-        ".html": "html"
-    }
-    file_type = extension_to_type.get(file_extension, "other")  # Default to 'other' for unknown types
+    file_type = EXTENSION_TO_TYPE.get(file_extension, "other")  # Default to 'other' for unknown types
 
     # Generate a structured S3 object key
     object_key = generate_s3_object_key(source, file_type, file_extension)
 
     try:
         # Upload the file to S3
-        s3_client.upload_file(
+        get_s3_client().upload_file(
             file_path, S3_BUCKET_NAME, object_key,
             ExtraArgs={
                 "Metadata": metadata or {},  # Add metadata
                 "ServerSideEncryption": "AES256"  # Enable encryption
-            }
+            },
+            Config=get_transfer_config()
         )
         # Return the public S3 URL
         return f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{object_key}"
     except Exception as e:
         raise RuntimeError(f"Error uploading {file_path} to S3: {str(e)}")
+
+
+class _ChunkStream(io.RawIOBase):
+    """A read-only, non-seekable file object over an iterable of byte chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._current = memoryview(b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._current:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                return 0  # End of stream
+            self._current = memoryview(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+
+def _as_fileobj(data):
+    """Wrap bytes, str, a file-like object or an iterable of chunks as a readable file object."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return io.BytesIO(data)
+    if hasattr(data, "read"):
+        return data
+    # Buffered so every read returns a full multipart chunk until the producer is exhausted
+    return io.BufferedReader(_ChunkStream(data), buffer_size=S3_MULTIPART_CHUNKSIZE)
+
+
+def upload_stream_to_s3(data, source: str, file_extension: str, metadata: dict = None) -> str:
+    """
+    Upload content to S3 without a local file, switching to multipart uploads for large objects.
+
+    Args:
+        data: bytes, str, a readable file-like object, or an iterable/generator of byte chunks.
+              Iterables are consumed as they are produced, one multipart chunk at a time.
+        source (str): File source (e.g., 'processed_pdfs', 'scraped_websites').
+        file_extension (str): File extension deciding the folder and content type (e.g., '.md', '.png').
+        metadata (dict): Optional metadata tags for the object.
+
+    Returns:
+        str: Public URL of the uploaded file.
+    """
+    file_extension = file_extension.lower()
+    file_type = EXTENSION_TO_TYPE.get(file_extension, "other")  # Default to 'other' for unknown types
+    object_key = generate_s3_object_key(source, file_type, file_extension)
+    content_type = mimetypes.guess_type(f"object{file_extension}")[0] or "application/octet-stream"
+
+    try:
+        get_s3_client().upload_fileobj(
+            _as_fileobj(data), S3_BUCKET_NAME, object_key,
+            ExtraArgs={
+                "ContentType": content_type,
+                "Metadata": metadata or {},  # Add metadata
+                "ServerSideEncryption": "AES256"  # Enable encryption
+            },
+            Config=get_transfer_config()
+        )
+        return f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/{object_key}"
+    except Exception as e:
+        raise RuntimeError(f"Error uploading {object_key} to S3: {str(e)}")
+
+
+def upload_bytes_to_s3(data: bytes, source: str, file_extension: str, metadata: dict = None) -> str:
+    """
+    Upload in-memory content to S3 with structured naming, without a local file.
+
+    Args:
+        data (bytes): Content of the object.
+        source (str): File source (e.g., 'processed_pdfs', 'scraped_websites').
+        file_extension (str): File extension deciding the folder and content type (e.g., '.md', '.png').
+        metadata (dict): Optional metadata tags for the object.
+
+    Returns:
+        str: Public URL of the uploaded file.
+    """
+    # Small payloads go out as a single PutObject; large ones are split by the transfer manager
+    return upload_stream_to_s3(data, source, file_extension, metadata)
+
+
+def download_bytes_from_s3(s3_url: str) -> bytes:
+    """
+    Read back an object uploaded by this module.
+
+    Args:
+        s3_url (str): Public URL returned by one of the upload functions.
+
+    Returns:
+        bytes: Content of the object.
+    """
+    prefix = f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/"
+    if not s3_url.startswith(prefix):
+        raise ValueError(f"Not an object of bucket {S3_BUCKET_NAME}: {s3_url}")
+    object_key = s3_url[len(prefix):]
+    try:
+        return get_s3_client().get_object(Bucket=S3_BUCKET_NAME, Key=object_key)["Body"].read()
+    except Exception as e:
+        raise RuntimeError(f"Error downloading {object_key} from S3: {str(e)}")
+
+
+class UploadItem(NamedTuple):
+    """One object of an upload_many batch."""
+    payload: object  # Local file path, bytes, file-like object or iterable of chunks
+    source: str
+    metadata: dict = None
+    file_extension: str = None  # Required for in-memory payloads; a str payload is content when set
+
+
+def _upload_item(item: UploadItem) -> str:
+    if isinstance(item.payload, (str, os.PathLike)) and item.file_extension is None:
+        return upload_file_to_s3(str(item.payload), item.source, None, metadata=item.metadata)
+    if item.file_extension is None:
+        raise ValueError("file_extension is required for in-memory payloads")
+    return upload_stream_to_s3(item.payload, item.source, item.file_extension, item.metadata)
+
+
+def upload_many(items: list) -> tuple:
+    """
+    Upload a batch of objects concurrently over the shared S3 connection pool.
+
+    Args:
+        items (list): UploadItem entries or (payload, source, metadata[, file_extension]) tuples.
+
+    Returns:
+        tuple: (urls, errors) where urls holds the public URL of every item in input order
+               (None for failed items) and errors maps the index of each failed item to its message.
+    """
+    items = [item if isinstance(item, UploadItem) else UploadItem(*item) for item in items]
+    futures = [_upload_executor.submit(_upload_item, item) for item in items]
+
+    urls, errors = [], {}
+    for index, future in enumerate(futures):
+        try:
+            urls.append(future.result())
+        except Exception as e:
+            # One failed object does not abort the rest of the batch
+            logging.error(f"Upload {index + 1}/{len(items)} to {items[index].source} failed: {e}")
+            urls.append(None)
+            errors[index] = str(e)
+    return urls, errors
@@ -0,0 +1,125 @@
+import asyncio
+
+from apify_client._models import RunResponse
+from apify_client._resource_clients.dataset import DatasetItemsPage
+
+from backend import web_scrape_enterprise
+
+URLS = ["https://example.com/a", "https://example.com/b"]
+
+
+def make_run(status: str):
+    """A Run model parsed from an API payload, as apify_client 3.x returns from start() and get()."""
+    return RunResponse.model_validate({"data": {
+        "id": "run-1",
+        "actId": "actor-1",
+        "userId": "user-1",
+        "startedAt": "2026-01-01T00:00:00.000Z",
+        "status": status,
+        "meta": {"origin": "API"},
+        "stats": {},
+        "options": {"build": "latest", "timeoutSecs": 3600, "memoryMbytes": 1024, "diskMbytes": 2048},
+        "buildId": "build-1",
+        "defaultKeyValueStoreId": "store-1",
+        "defaultDatasetId": "dataset-1",
+        "defaultRequestQueueId": "queue-1",
+    }}).data
+
+
+class StubActorClient:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def start(self, run_input=None):
+        self.calls.append(("start", run_input["startUrls"]))
+        return make_run("RUNNING")
+
+
+class StubRunClient:
+    def __init__(self, calls, statuses):
+        self.calls = calls
+        self.statuses = statuses
+
+    async def get(self):
+        return make_run(self.statuses.pop(0))
+
+    async def abort(self):
+        self.calls.append(("abort",))
+
+
+class StubDatasetClient:
+    def __init__(self, items):
+        self.items = items
+
+    async def list_items(self, offset=0, limit=None, clean=None):
+        page = self.items[offset:offset + limit]
+        return DatasetItemsPage(items=page, total=len(self.items), offset=offset, count=len(page), limit=limit, desc=False)
+
+
+class StubApifyClient:
+    """Stands in for ApifyClientAsync with the 3.x response types."""
+
+    def __init__(self, token):
+        self.calls = []
+        # The first poll sees one page, the second the rest and a finished run
+        self.statuses = ["RUNNING", "SUCCEEDED"]
+        self.items = [{"url": URLS[0], "html": "", "markdown": "a"}, {"url": URLS[1], "html": "", "markdown": "b"}]
+        StubApifyClient.instance = self
+
+    def actor(self, actor_id):
+        return StubActorClient(self.calls)
+
+    def run(self, run_id):
+        self.calls.append(("run", run_id))
+        return StubRunClient(self.calls, self.statuses)
+
+    def dataset(self, dataset_id):
+        self.calls.append(("dataset", dataset_id))
+        return StubDatasetClient(self.items)
+
+
+def test_iter_scrape_enterprise_runs_start_poll_list_flow(monkeypatch):
+    monkeypatch.setattr(web_scrape_enterprise, "ApifyClientAsync", StubApifyClient)
+    monkeypatch.setattr(web_scrape_enterprise, "APIFY_POLL_SECONDS", 0)
+    monkeypatch.setattr(web_scrape_enterprise, "_probe", lambda url: (None, {}))
+    monkeypatch.setattr(
+        web_scrape_enterprise, "process_item",
+        lambda item, url, validators, store_diff_file: {"status": "success", "markdown": item["markdown"]}
+    )
+
+    async def collect():
+        return [result async for result in web_scrape_enterprise.iter_scrape_enterprise(URLS)]
+
+    results = dict(asyncio.run(collect()))
+
+    assert results == {
+        URLS[0]: {"status": "success", "markdown": "a"},
+        URLS[1]: {"status": "success", "markdown": "b"},
+    }
+    calls = StubApifyClient.instance.calls
+    assert ("run", "run-1") in calls
+    assert ("dataset", "dataset-1") in calls
+    assert ("abort",) not in calls  # The run finished on its own
+
+
+def test_iter_scrape_enterprise_reports_urls_missing_from_finished_run(monkeypatch):
+    monkeypatch.setattr(web_scrape_enterprise, "ApifyClientAsync", StubApifyClient)
+    monkeypatch.setattr(web_scrape_enterprise, "APIFY_POLL_SECONDS", 0)
+    monkeypatch.setattr(web_scrape_enterprise, "_probe", lambda url: (None, {}))
+    monkeypatch.setattr(web_scrape_enterprise, "process_item", lambda *args: {"status": "success"})
+
+    # Only the first URL comes back from the crawler
+    original_init = StubApifyClient.__init__
+
+    def init_with_one_item(self, token):
+        original_init(self, token)
+        self.items = self.items[:1]
+
+    monkeypatch.setattr(StubApifyClient, "__init__", init_with_one_item)
+
+    async def collect():
+        return [result async for result in web_scrape_enterprise.iter_scrape_enterprise(URLS)]
+
+    results = asyncio.run(collect())
+
+    assert dict(results)[URLS[1]] == {"error": f"Crawler run SUCCEEDED without a result for {URLS[1]}"}